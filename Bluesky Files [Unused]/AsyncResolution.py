@@ -0,0 +1,103 @@
+''' Asynchronous conflict resolution on a worker pool.
+
+The simulation loop submits the encounters of its detected conflicts and polls for advisories; neither call does
+any resolution work, so the step time does not depend on the number of conflicts. Requests are keyed by aircraft
+pair. While the pool is busy, new requests wait in a queue that holds only the newest state of every pair, and
+all waiting pairs are sent to a worker as one batch for BatchResolution. A result replaces the advisory of its
+pair if it was computed from a newer request, so a pair that is resubmitted on every step still gets advisories
+when batches take longer than a step; results older than the advisory already held are dropped. A batch that
+raises in the worker is reported with a warning and leaves its pairs to be served by their next request.
+'''
+
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from BatchResolution import d_req, resolve_batch
+
+
+def _resolve(serials, encounters, d_req):
+    ''' Worker: resolves a batch of encounters. Top level so that process pools can pickle it. '''
+    return serials, resolve_batch(encounters, d_req=d_req)
+
+
+class AsyncResolver:
+    ''' Pair-keyed resolution requests served by a thread or process pool. '''
+
+    def __init__(self, workers=None, processes=True, max_batches=None, d_req=d_req):
+        self.executor = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers)
+        self.max_batches = max_batches or workers or os.cpu_count() or 1 # batches in flight
+        self.d_req = d_req
+        self.serial = 0 # number of requests submitted
+        self.latest = dict() # pair -> serial of its newest request
+        self.waiting = dict() # pair -> (serial, encounter) not yet sent to a worker
+        self.futures = dict() # future -> pairs of its batch
+        self.advisories = dict() # pair -> newest advisory
+        self.advisory_serials = dict() # pair -> serial of the request its advisory was computed from
+        self.dropped = 0 # requests replaced while waiting, or whose result arrived after a newer one
+        self.failed = 0 # requests of batches that raised in the worker
+
+    def submit(self, pairs, encounters):
+        ''' Queues resolution requests for a sequence of pairs (e.g. (id A, id B) tuples) and their encounters as
+        a struct-of-arrays (see BatchResolution.make_encounters). A newer request for a pair replaces the one
+        still waiting; requests already in progress still deliver their result. '''
+        for i, pair in enumerate(pairs):
+            self.serial += 1
+            if pair in self.waiting:
+                self.dropped += 1
+            self.latest[pair] = self.serial
+            self.waiting[pair] = (self.serial, {key: value[i] for key, value in encounters.items()})
+        self.dispatch()
+
+    def dispatch(self):
+        ''' Sends all waiting requests to a worker as one batch, if fewer than max_batches are in flight. '''
+        if not self.waiting or len(self.futures) >= self.max_batches:
+            return
+        pairs = list(self.waiting)
+        serials = np.array([self.waiting[pair][0] for pair in pairs])
+        encounters = {key: np.array([self.waiting[pair][1][key] for pair in pairs])
+                      for key in next(iter(self.waiting.values()))[1]}
+        self.waiting.clear()
+        self.futures[self.executor.submit(_resolve, serials, encounters, self.d_req)] = pairs
+
+    def poll(self):
+        ''' Collects the finished batches without blocking and dispatches waiting requests to the freed workers.
+        Returns the pairs whose advisory was updated; the advisories themselves are in self.advisories as
+        dictionaries with the keys of resolve_batch. Exceptions raised by a worker are not propagated: the batch
+        is counted in self.failed and reported with a warning. '''
+        updated = []
+        for future in [future for future in self.futures if future.done()]:
+            pairs = self.futures.pop(future)
+            try:
+                serials, resolution = future.result()
+            except Exception as error:
+                self.failed += len(pairs)
+                warnings.warn(f'Resolution of {len(pairs)} conflicts failed: {error!r}')
+                continue
+            for i, (pair, serial) in enumerate(zip(pairs, serials)):
+                # Forgotten pairs and results older than the advisory already held are dropped
+                if pair not in self.latest or serial < self.advisory_serials.get(pair, 0):
+                    self.dropped += 1
+                    continue
+                self.advisories[pair] = {key: value[i] for key, value in resolution.items()}
+                self.advisory_serials[pair] = serial
+                updated.append(pair)
+        self.dispatch()
+        return updated
+
+    def forget(self, pairs):
+        ''' Discards the requests and advisories of pairs that are no longer in conflict. '''
+        for pair in pairs:
+            self.latest.pop(pair, None)
+            self.waiting.pop(pair, None)
+            self.advisories.pop(pair, None)
+            self.advisory_serials.pop(pair, None)
+
+    def pending(self):
+        ''' Number of requests waiting or in progress. '''
+        return len(self.waiting) + sum(len(pairs) for pairs in self.futures.values())
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
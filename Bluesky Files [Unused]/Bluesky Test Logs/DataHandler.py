@@ -1,54 +1,368 @@
-def datahandler():
-    ''' Function for retrieving data from BlueSky log files. Outputs a dictionary with keys = aircraft number
-    and items = subdictionaries. Subdictionary keys = measurement labels and subdictionary items = lists of 
-    corresponding data. Everything in output is in string format.
-    - Aidan Wallace, University of MD College Park, 2020 '''
+import glob
+import io
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+
+def read_header(file):
+    ''' Reads the log tag and data labels from the two header lines of an open BlueSky log file. '''
+    tag = file.readline().strip('# \n')
+    labels = file.readline().strip('# \n').replace(',', ' ').split()
+    return tag, labels
+
+
+def column_types(lines, labels):
+    ''' Infers the type of every column from a block of data lines: float where the first row converts,
+    string (e.g. the aircraft id) otherwise. '''
+    types = dict()
+    for label, value in zip(labels, lines[0].split(',')):
+        try:
+            float(value)
+            types[label] = float
+        except ValueError:
+            types[label] = str
+    return types
+
+
+def parse_lines(lines, labels, types):
+    ''' Converts a block of data lines to a dictionary of typed NumPy columns. Numeric and string columns are
+    each parsed in one pass of np.loadtxt, without building Python lists per field. '''
+    numeric = [i for i, label in enumerate(labels) if types[label] is float]
+    strings = [i for i, label in enumerate(labels) if types[label] is str]
+    columns = dict()
+    if numeric:
+        values = np.loadtxt(lines, delimiter=',', usecols=numeric, ndmin=2).T.copy()
+        columns.update((labels[i], values[k]) for k, i in enumerate(numeric))
+    for i in strings:
+        columns[labels[i]] = np.char.strip(np.loadtxt(lines, delimiter=',', usecols=(i,), dtype=str, ndmin=1))
+    return {label: columns[label] for label in labels}
+
+
+def iter_log(filename, chunk_size=100000):
+    ''' Streams a BlueSky log file in blocks of chunk_size rows. Yields dictionaries with keys = data labels and
+    items = typed NumPy arrays for the rows of each block, so memory use is bounded by the block size. '''
+    with open(filename) as file:
+        _, labels = read_header(file)
+        types = None
+        while True:
+            lines = list(islice(file, chunk_size))
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                break
+            if types is None:
+                types = column_types(lines, labels)
+            yield parse_lines(lines, labels, types)
+
+
+def follow_log(filename, poll_interval=0.5, timeout=None):
+    ''' Follows a log file while BlueSky is writing it, like tail -f. Yields dictionaries of typed NumPy columns
+    for the complete rows appended since the previous yield; a partly written last line is held back until it is
+    finished. Stops after timeout seconds without new rows (never if None) and starts over if the file shrinks,
+    e.g. when BlueSky reopens the log. '''
+    labels = types = None
+    position = 0
+    pending = b''
+    idle = 0
+    while timeout is None or idle < timeout:
+        size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        if size < position:
+            labels = types = None
+            position = 0
+            pending = b''
+
+        # Wait for both header lines before reading data
+        if labels is None and size > 0:
+            with open(filename, 'rb') as file:
+                header = [file.readline(), file.readline()]
+            if header[1].endswith(b'\n'):
+                _, labels = read_header(io.StringIO(b''.join(header).decode()))
+                position = len(header[0]) + len(header[1])
+
+        # Only the bytes appended since the last read, up to the last complete line
+        lines = []
+        if labels is not None and size > position:
+            with open(filename, 'rb') as file:
+                file.seek(position)
+                pending += file.read(size - position)
+            position = size
+            complete, _, pending = pending.rpartition(b'\n')
+            lines = [line for line in complete.decode().split('\n') if line.strip()]
+
+        if lines:
+            if types is None:
+                types = column_types(lines, labels)
+            idle = 0
+            yield parse_lines(lines, labels, types)
+        else:
+            time.sleep(poll_interval)
+            idle += poll_interval
+
+
+def read_log(filename, chunk_size=100000):
+    ''' Parses a whole BlueSky log file block by block. Returns the log tag, the data labels and a dictionary
+    with keys = data labels and items = typed NumPy arrays over all rows. The blocks are joined one column at a
+    time, releasing each column's blocks once joined, so the peak memory use is the parsed log plus one column
+    and the text of one block. '''
+    with open(filename) as file:
+        tag, labels = read_header(file)
+    chunks = list(iter_log(filename, chunk_size))
+    columns = dict()
+    for label in labels:
+        columns[label] = np.concatenate([chunk.pop(label) for chunk in chunks]) if chunks else np.array([])
+    return tag, labels, columns
+
+
+def aircraft_index(ids):
+    ''' Vectorized group-by on the aircraft id column. Returns the stable sort order of the rows (time order is
+    kept within each aircraft), the aircraft ids in order of first appearance and the [start, stop) row range of
+    each aircraft in the sorted rows. '''
+    order = np.argsort(ids, kind='stable')
+    ordered = ids[order]
+    # The sorted ids change at the start of every aircraft, found without a second sort as np.unique would do
+    starts = np.flatnonzero(np.append(ordered.size > 0, ordered[1:] != ordered[:-1]))
+    stops = np.append(starts[1:], ordered.size)
+    appearance = np.argsort(order[starts], kind='stable')
+    return order, ordered[starts][appearance], starts[appearance], stops[appearance]
+
+
+def split_aircraft(columns, ids, starts, stops):
+    ''' Per-aircraft dictionaries of column slices for columns already sorted by aircraft, see aircraft_index. '''
+    return {str(aircraft): {label: column[start:stop] for label, column in columns.items()}
+            for aircraft, start, stop in zip(ids, starts, stops)}
+
+
+def group_by_aircraft(columns, key='id'):
+    ''' Groups typed log columns by aircraft id. Copes with aircraft entering and leaving the log. Returns a
+    dictionary with keys = aircraft ids and items = dictionaries of contiguous per-aircraft columns. '''
+    order, ids, starts, stops = aircraft_index(columns[key])
+    return split_aircraft({label: column[order] for label, column in columns.items()}, ids, starts, stops)
+
+
+#### Binary columnar cache ####
+
+def cache_path(filename):
+    ''' Sidecar directory holding the binary cache of a log file. '''
+    return filename + '.cache'
+
+
+def write_cache(filename, tag, labels, columns, index):
+    ''' Writes one .npy file per column and an index.npz with the aircraft row ranges, the header and the size
+    and modification time of the source log. The index is written last, so an interrupted write is never read. '''
+    path = cache_path(filename)
+    stat = os.stat(filename)
+    os.makedirs(path, exist_ok=True)
+    for i, label in enumerate(labels):
+        np.save(os.path.join(path, f'{i}.npy'), columns[label])
+    ids, starts, stops = index if index is not None else (np.array([], dtype=str), np.array([]), np.array([]))
+    np.savez(os.path.join(path, 'index.npz'), tag=tag, labels=np.array(labels), size=stat.st_size,
+             mtime=stat.st_mtime_ns, grouped=index is not None, ids=ids, starts=starts, stops=stops)
+
 
-    # Prompt user to specify file for analysis
-    # f = input('Input BlueSky log file for data analysis:')
+def read_cache(filename):
+    ''' Memory-maps the binary cache of a log file. Returns None if there is no cache or the source log changed
+    size or modification time since it was written. '''
+    path = cache_path(filename)
+    try:
+        with np.load(os.path.join(path, 'index.npz')) as meta:
+            meta = dict(meta)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(filename)
+    if meta['size'] != stat.st_size or meta['mtime'] != stat.st_mtime_ns:
+        return None
+    labels = [str(label) for label in meta['labels']]
+    columns = {label: np.load(os.path.join(path, f'{i}.npy'), mmap_mode='r') for i, label in enumerate(labels)}
+    index = (meta['ids'], meta['starts'], meta['stops']) if meta['grouped'] else None
+    return str(meta['tag']), labels, columns, index
+
+
+def load_log(filename, chunk_size=100000, cache=True):
+    ''' Loads a log with its columns sorted by aircraft id. The first parse writes a binary cache next to the log
+    and later loads memory-map it without copying, until the log changes. Returns the tag, the data labels, the
+    columns and the aircraft index (ids, starts, stops), which is None for logs without an id column. Columns are
+    sorted one at a time, so parsing peaks at the parsed log plus one column and one block, see read_log. '''
+    if cache:
+        cached = read_cache(filename)
+        if cached is not None:
+            return cached
+
+    tag, labels, columns = read_log(filename, chunk_size)
+    index = None
+    if 'id' in columns:
+        order, ids, starts, stops = aircraft_index(columns['id'])
+        for label in labels:
+            columns[label] = columns[label][order]
+        index = (ids, starts, stops)
+
+    if cache:
+        try:
+            write_cache(filename, tag, labels, columns, index)
+        except OSError as error:
+            warnings.warn(f'Could not write log cache: {error}')
+    return tag, labels, columns, index
+
+
+def datahandler(filename, chunk_size=100000, cache=True):
+    ''' Function for retrieving data from BlueSky log files. Outputs a dictionary with keys = aircraft id
+    and items = subdictionaries. Subdictionary keys = measurement labels and subdictionary items = NumPy arrays
+    of corresponding data, float for numeric columns and str otherwise. The log is read in blocks of chunk_size
+    rows, see iter_log, and cached in binary form, see load_log. Logs without an id column are split by the
+    number of aircraft at the initial time.
+    - Aidan Wallace, University of MD College Park, 2020 '''
 
     # Read in log file
-    with open('TESTLOG_00_Custom Log_20201031_08-02-07.log') as file:
-        rawtag = file.readline()
-        rawlabels = file.readline()
-        rawdata = file.readlines()
-
-    # Get log tag and data labels
-    tag = rawtag.strip('# ')
-    labels = rawlabels.strip('# ').replace(',',' ').split()
+    tag, labels, columns, index = load_log(filename, chunk_size, cache)
     print(f'This log is tagged: {tag}')
     print(f'This log contains information on {labels}')
-    
 
-    # Convert data entries to lists
-    formatted_data = []
-    for line in rawdata:
-        formatted_data.append(line.strip('\n').replace(',',' ').split())
+    # Group the rows by aircraft id
+    if index is not None:
+        data = split_aircraft(columns, *index)
+        print(f'This log contains {len(data)} aircraft.')
+        return data
 
     # Find how many aircraft are on the log
-    acno = 1
-    initialentry = formatted_data[0]
-    for entry in formatted_data[1::]:
-        if entry[0] == initialentry[0]: acno += 1 #If initial time is the same, it's a different aircraft
-        else: break
+    times = columns[labels[0]]
+    later = np.flatnonzero(times != times[0])
+    acno = later[0] if later.size > 0 else times.size # If initial time is the same, it's a different aircraft
     print(f'This log contains {acno} aircraft.')
 
-    # Parse data into the logs for each individual aircraft
-    acdata_list = []
-    for i in range(acno):
-         acdata_list.append(formatted_data[i::acno])
-
-    # Create empty nested dictionary for each aircraft and its measured values
+    # Populate the data dictionary with a view per aircraft
     data = dict()
     for i in range(acno):
-        data.setdefault(f'Aircraft {i+1}', dict())
-
-    # Populate the data dictionary
-    for acno, aircraft in enumerate(data.keys()):
-        for varno, label in enumerate(labels):
-            data[aircraft].setdefault(label, [item[varno] for item in acdata_list[acno]])
+        data[f'Aircraft {i+1}'] = {label: column[i::acno] for label, column in columns.items()}
 
     return data
 
-data = datahandler()
-print(data['Aircraft 1']['lat'])
\ No newline at end of file
+
+#### Time-indexed state queries ####
+
+class StateIndex:
+    ''' Time index over log columns sorted by aircraft id and time, as returned by load_log. Supports the state
+    of an aircraft at any time by linear interpolation, time window slices and snapshots of the whole fleet at a
+    given time. Angle columns (degrees) are interpolated the short way around. '''
+
+    def __init__(self, columns, index, time_label='simt', angle_labels=('hdg', 'trk')):
+        self.columns = columns
+        self.ids, self.starts, self.stops = (np.asarray(array) for array in index)
+        self.aircraft = {str(aircraft): i for i, aircraft in enumerate(self.ids)}
+        self.time = np.asarray(columns[time_label])
+        self.numeric = [label for label, column in columns.items() if column.dtype.kind == 'f']
+        self.angle_labels = [label for label in angle_labels if label in self.numeric]
+
+        # Composite key, increasing over the whole array: position of the aircraft's rows, then time
+        segments = np.argsort(self.starts)
+        self.position = np.empty_like(segments)
+        self.position[segments] = np.arange(len(segments))
+        rank = np.repeat(np.arange(len(segments)), (self.stops - self.starts)[segments])
+        self.t_min = self.time.min(initial=0)
+        self.span = self.time.max(initial=0) - self.t_min + 1
+        self.key = rank*self.span + (self.time - self.t_min)
+
+    @classmethod
+    def from_log(cls, filename, **kwargs):
+        ''' Time index over a log file, loaded through the binary cache. '''
+        _, _, columns, index = load_log(filename)
+        return cls(columns, index, **kwargs)
+
+    def _interpolate(self, lower, upper, t):
+        # Linear interpolation of all numeric columns between rows lower and upper
+        t0 = self.time[lower]
+        dt = self.time[upper] - t0
+        weight = np.where(dt > 0, (t - t0)/np.where(dt > 0, dt, 1), 0)
+        state = dict()
+        for label in self.numeric:
+            column = self.columns[label]
+            delta = column[upper] - column[lower]
+            if label in self.angle_labels:
+                delta = (delta + 180) % 360 - 180
+                state[label] = (column[lower] + weight*delta) % 360
+            else:
+                state[label] = column[lower] + weight*delta
+        return state
+
+    def state(self, aircraft, t):
+        ''' Interpolated numeric state of one aircraft at time(s) t, clamped to the times it is on the log. '''
+        i = self.aircraft[aircraft]
+        start, stop = self.starts[i], self.stops[i]
+        times = self.time[start:stop]
+        t = np.clip(t, times[0], times[-1])
+        upper = start + np.clip(np.searchsorted(times, t), 0, stop - start - 1)
+        lower = np.maximum(upper - 1, start)
+        lower = np.where(self.time[upper] == t, upper, lower)
+        return self._interpolate(lower, upper, t)
+
+    def window(self, aircraft, t0, t1):
+        ''' Rows of one aircraft with t0 <= time <= t1, as column slices. '''
+        i = self.aircraft[aircraft]
+        start, stop = self.starts[i], self.stops[i]
+        times = self.time[start:stop]
+        lower = start + np.searchsorted(times, t0, side='left')
+        upper = start + np.searchsorted(times, t1, side='right')
+        return {label: column[lower:upper] for label, column in self.columns.items()}
+
+    def snapshot(self, t):
+        ''' State of every aircraft on the log at time t, vectorized across the fleet. Returns the ids of the
+        aircraft present at t and a dictionary of interpolated numeric columns in the same order. '''
+        present = (self.time[self.starts] <= t) & (self.time[self.stops - 1] >= t)
+        rank = np.flatnonzero(present)
+        upper = np.searchsorted(self.key, self.position[rank]*self.span + (t - self.t_min), side='left')
+        upper = np.minimum(upper, self.stops[rank] - 1)
+        lower = np.where(self.time[upper] == t, upper, np.maximum(upper - 1, self.starts[rank]))
+        return self.ids[rank], self._interpolate(lower, upper, t)
+
+
+#### Parallel ingestion of many logs ####
+
+def _ingest(filename, chunk_size):
+    # Worker: parses one log into its binary cache. Only falls back to returning the columns if the cache
+    # cannot be written, so large arrays normally never pass through pickling
+    log = load_log(filename, chunk_size)
+    return None if read_cache(filename) is not None else log
+
+
+def load_logs(path, pattern='TESTLOG_*.log', processes=None, chunk_size=100000):
+    ''' Parses all logs matching pattern in directory path (or the glob path itself) in parallel over a process
+    pool. Returns the list of log files, a dictionary with keys = data labels and items = the concatenated columns
+    of all logs sorted by log and aircraft, the index of the source file of every row, and an aircraft index: a
+    dictionary with the log number, id and [start, stop) row range of every aircraft. The columns only hold the
+    logs' own labels, so a label such as 'log' cannot collide with the indexes. '''
+    filenames = sorted(glob.glob(os.path.join(path, pattern) if os.path.isdir(path) else path))
+    if not filenames:
+        raise FileNotFoundError(f'No logs found for {path}')
+
+    with ProcessPoolExecutor(processes) as pool:
+        results = list(pool.map(_ingest, filenames, [chunk_size]*len(filenames)))
+    logs = [result if result is not None else read_cache(filename)
+            for filename, result in zip(filenames, results)]
+
+    labels = logs[0][1]
+    for filename, (_, log_labels, _, index) in zip(filenames, logs):
+        if log_labels != labels:
+            raise ValueError(f'{filename} has data labels {log_labels}, expected {labels}')
+        if index is None:
+            raise ValueError(f'{filename} has no id column to index aircraft by')
+
+    # Concatenate the logs and offset each log's aircraft row ranges
+    sizes = [len(columns[labels[0]]) for _, _, columns, _ in logs]
+    offsets = np.cumsum([0] + sizes[:-1])
+    columns = {label: np.concatenate([columns[label] for _, _, columns, _ in logs]) for label in labels}
+    source = np.repeat(np.arange(len(logs)), sizes)
+    aircraft = {
+        'log': np.concatenate([np.full(len(index[0]), i) for i, (_, _, _, index) in enumerate(logs)]),
+        'id': np.concatenate([index[0] for _, _, _, index in logs]),
+        'start': np.concatenate([index[1] + offset for (_, _, _, index), offset in zip(logs, offsets)]),
+        'stop': np.concatenate([index[2] + offset for (_, _, _, index), offset in zip(logs, offsets)])}
+    return filenames, columns, source, aircraft
+
+
+if __name__ == '__main__':
+    # Specify file for analysis
+    data = datahandler(sys.argv[1] if len(sys.argv) > 1 else 'TESTLOG_00_Custom Log_20201031_08-02-07.log')
+    print(next(iter(data.values()))['lat'])
@@ -0,0 +1,104 @@
+''' Fleet-wide conflict detection ahead of maneuver evaluation.
+
+The broad phase culls aircraft pairs that cannot lose separation within the look-ahead horizon without
+checking all N^2 pairs: every aircraft's straight-line path over the horizon is bounded by a circle around its
+midpoint, and a KD-tree returns only the pairs whose circles come within the required separation. Surviving
+pairs are converted to encounters relative to aircraft A for BatchResolution.
+
+Positions are in meters (x east, y north), headings in radians from north and airspeeds in m/s.
+'''
+
+import numpy as np
+
+from Projection import relative_frames
+
+
+look_ahead = 120 # collision look-ahead [s] (MetareasoningInitFcn.m)
+d_req = 9260 # 5 nautical miles in meters (LOS_m)
+
+
+def velocities(headings, airspeeds):
+    ''' Velocity vectors (N, 2) for headings measured from north. '''
+    headings = np.asarray(headings, dtype=float)
+    airspeeds = np.asarray(airspeeds, dtype=float)
+    return np.stack((airspeeds*np.sin(headings), airspeeds*np.cos(headings)), axis=-1)
+
+
+def broad_phase(positions, headings, airspeeds, look_ahead=look_ahead, d_req=d_req, groups=None):
+    ''' Returns the (K, 2) array of index pairs i < j that may come within d_req of each other during the next
+    look_ahead seconds on their current headings. Each aircraft's path is swept over the horizon and bounded by a
+    circle around the path midpoint, so no conflicting pair is culled. If groups is given (e.g. the timestep of
+    each state), only aircraft in the same group are paired, and all groups are searched in one query. '''
+    from scipy.spatial import cKDTree
+    positions = np.asarray(positions, dtype=float)
+    if len(positions) < 2:
+        return np.empty((0, 2), dtype=int)
+    sweep = velocities(headings, airspeeds)*look_ahead
+    midpoints = positions + sweep/2
+    half_lengths = np.hypot(sweep[:, 0], sweep[:, 1])/2
+    reach = d_req + 2*half_lengths.max()
+
+    # Groups are stacked in layers further apart than the query reach
+    if groups is not None:
+        layer = np.unique(groups, return_inverse=True)[1]*2*reach
+        midpoints = np.column_stack((midpoints, layer))
+
+    # Query with the largest possible reach, then apply each pair's own bound
+    tree = cKDTree(midpoints)
+    pairs = tree.query_pairs(reach, output_type='ndarray')
+    i, j = pairs[:, 0], pairs[:, 1]
+    distance = np.linalg.norm(midpoints[j] - midpoints[i], axis=1)
+    return pairs[distance <= d_req + half_lengths[i] + half_lengths[j]]
+
+
+def pair_encounters(positions, headings, airspeeds, pairs):
+    ''' Encounters for BatchResolution from index pairs (A, B): B's position and heading are expressed in the frame
+    of A, with A at the origin heading north as ManeuverData expects. '''
+    airspeeds = np.asarray(airspeeds, dtype=float)
+    x_b, y_b, heading_b = relative_frames(positions, headings, pairs)
+    return {'x_b': x_b,
+            'y_b': y_b,
+            'heading_b': heading_b,
+            'airspeed_a': airspeeds[pairs[:, 0]],
+            'airspeed_b': airspeeds[pairs[:, 1]]}
+
+
+def cpa_screen(positions, headings, airspeeds, pairs, look_ahead=look_ahead, d_req=d_req):
+    ''' Null-maneuver closest point of approach for arrays of candidate pairs, as (18) and (19) without a turn.
+    Returns a dictionary of arrays with the time to CPA (s, 0 if the pair is diverging), the CPA distance (m), the
+    time to loss of separation (s, 0 if already lost, inf if never) and a conflict flag for pairs that lose
+    separation within look_ahead. Pairs on parallel tracks with equal speeds (Vr = 0) keep their current
+    distance. '''
+    positions = np.asarray(positions, dtype=float)
+    velocity = velocities(headings, airspeeds)
+    a, b = pairs[:, 0], pairs[:, 1]
+    dx, dy = (positions[b] - positions[a]).T
+    Vrx, Vry = (velocity[b] - velocity[a]).T
+
+    # Time and distance of closest approach, guarding the division for Vr = 0
+    Vr2 = Vrx**2 + Vry**2
+    dot = dx*Vrx + dy*Vry
+    moving = Vr2 > 0
+    t_cpa = np.maximum(-dot/np.where(moving, Vr2, 1), 0)
+    d_cpa = np.hypot(dx + Vrx*t_cpa, dy + Vry*t_cpa)
+
+    # Time to loss of separation: first root of |d + Vr t| = d_req
+    d2 = dx**2 + dy**2
+    discriminant = dot**2 - Vr2*(d2 - d_req**2)
+    with np.errstate(invalid='ignore'):
+        t_los = (-dot - np.sqrt(discriminant))/np.where(moving, Vr2, 1)
+    t_los = np.where(d2 < d_req**2, 0, np.where(moving & (d_cpa < d_req) & (t_los >= 0), t_los, np.inf))
+
+    return {'t_cpa': t_cpa,
+            'd_cpa': d_cpa,
+            't_los': t_los,
+            'conflict': t_los <= look_ahead}
+
+
+def detect(positions, headings, airspeeds, look_ahead=look_ahead, d_req=d_req):
+    ''' Broad phase followed by the CPA screen. Returns the conflicting pairs and their screen data, for
+    pair_encounters and resolution. '''
+    pairs = broad_phase(positions, headings, airspeeds, look_ahead, d_req)
+    screen = cpa_screen(positions, headings, airspeeds, pairs, look_ahead, d_req)
+    conflict = screen['conflict']
+    return pairs[conflict], {key: value[conflict] for key, value in screen.items()}
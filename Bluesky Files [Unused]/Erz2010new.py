@@ -1,6 +1,31 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
 import numpy as np
-from scipy import signal
-import matplotlib.pyplot as plt
+
+
+# The 12 maneuvers as (label, bank angle of A, bank angle of B) in degrees, in order of preference.
+# The sign of the bank angle gives the turn direction, a bank angle of 0 means the aircraft flies straight.
+maneuvers = (
+    ('A right B straight (15)', 15, 0),
+    ('A left B straight (15)', -15, 0),
+    ('A straight B right (15)', 0, 15),
+    ('A straight B left (15)', 0, -15),
+    ('A right B straight (30)', 30, 0),
+    ('A left B straight (30)', -30, 0),
+    ('A straight B right (30)', 0, 30),
+    ('A straight B left (30)', 0, -30),
+    ('A right B right', 30, 30),
+    ('A left B right', -30, 30),
+    ('A right B left', 30, -30),
+    ('A left B left', -30, -30),
+)
+
+# Refinement stages of the anytime resolver as (number of maneuvers evaluated, turn angle grid step in deg). Each
+# stage evaluates the most preferred maneuvers on a grid from 0 to 148 deg
+anytime_stages = ((4, 30), (12, 30), (12, 10), (12, 4), (12, 2))
 
 
 class MainAircraft:
@@ -66,11 +91,412 @@ class ConflictingCraft(MainAircraft):
                         b0[1] - R*np.sign(dphi)*np.sin(heading0) + R*np.sign(dphi)*np.sin(heading0 + dphi)])
         return turn_position
 
+#### Broadcasted kernels for arrays of encounters and turn angles ####
+
+def turn_end_positions(b0_x, b0_y, heading_b, airspeed_a, airspeed_b, bank_angle_a, bank_angle_b,
+                       turn_angle_a, turn_angle_b):
+# Turn time and positions of A (6) and B (8) at the end of turns to the given turn angles. All arguments broadcast
+# against each other. The aircraft with a zero turn angle flies straight for the duration of the other's turn
+    g = MainAircraft.g
+    turn_angle_a = np.asarray(turn_angle_a, dtype=float)
+    turn_angle_b = np.asarray(turn_angle_b, dtype=float)
+    turning_a = turn_angle_a != 0
+    turning_b = turn_angle_b != 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Turn time (3) and turn radius (2) of each aircraft
+        t_a = turn_angle_a*airspeed_a/g/np.tan(bank_angle_a)
+        t_b = turn_angle_b*airspeed_b/g/np.tan(bank_angle_b)
+        t = np.where(turning_a, t_a, np.where(turning_b, t_b, 0))
+        R_a = np.abs(airspeed_a**2/g/np.tan(bank_angle_a))
+        R_b = np.abs(airspeed_b**2/g/np.tan(bank_angle_b))
+
+        # A in turn (6) or straight along initial heading
+        R_a = R_a*np.sign(turn_angle_a)
+        x_a1 = np.where(turning_a, R_a*(1 - np.cos(turn_angle_a)), 0)
+        y_a1 = np.where(turning_a, R_a*np.sin(turn_angle_a), airspeed_a*t)
+
+        # B in turn (8) or straight along initial heading
+        R_b = R_b*np.sign(turn_angle_b)
+        x_b1 = b0_x + np.where(turning_b, R_b*np.cos(heading_b) - R_b*np.cos(heading_b + turn_angle_b),
+                               airspeed_b*np.sin(heading_b)*t)
+        y_b1 = b0_y + np.where(turning_b, -R_b*np.sin(heading_b) + R_b*np.sin(heading_b + turn_angle_b),
+                               airspeed_b*np.cos(heading_b)*t)
+    return t, x_a1, y_a1, x_b1, y_b1
+
+def straight_segment(dx1, dy1, Vrx, Vry):
+# Separation at the end of the turn from the relative position (dx1, dy1) of B, time after turn ends of min
+# separation in straight line segment (18) and min separation in straight line segment (19) for the relative
+# velocity (Vrx, Vry)
+    separation = np.sqrt(dx1**2 + dy1**2)
+    # On parallel tracks with equal speeds (Vr = 0) the separation stays constant after the turn
+    Vr2 = Vrx**2 + Vry**2
+    t_smin = np.where(Vr2 > 0, -(dx1*Vrx + dy1*Vry)/np.where(Vr2 > 0, Vr2, 1), 0)
+    d_smin = np.sqrt((dx1 + Vrx*t_smin)**2 + (dy1 + Vry*t_smin)**2)
+    return separation, t_smin, d_smin
+
+def separation_kernel(b0_x, b0_y, heading_b, airspeed_a, airspeed_b, bank_angle_a, bank_angle_b,
+                      turn_angle_a, turn_angle_b):
+# Separation at the end of the turn (10, 11, 13), time after turn ends of min separation in straight line
+# segment (18) and min separation in straight line segment (19), in a single broadcasted pass
+    t, x_a1, y_a1, x_b1, y_b1 = turn_end_positions(b0_x, b0_y, heading_b, airspeed_a, airspeed_b,
+                                                   bank_angle_a, bank_angle_b, turn_angle_a, turn_angle_b)
+    dx1 = x_b1 - x_a1
+    dy1 = y_b1 - y_a1
+    heading_a = turn_angle_a
+    heading_b = turn_angle_b + heading_b
+    Vrx = airspeed_b*np.sin(heading_b) - airspeed_a*np.sin(heading_a)
+    Vry = airspeed_b*np.cos(heading_b) - airspeed_a*np.cos(heading_a)
+    return straight_segment(dx1, dy1, Vrx, Vry)
+
+def separation_in_turn(b0_x, b0_y, heading_b, airspeed_a, airspeed_b, bank_angle_a, bank_angle_b):
+# Separation at the end of turns (10, 11, 13) as a function of turn time, with both aircraft turning at their bank
+# angles for that time (a bank angle of 0 flies straight). Arguments broadcast as in separation_kernel. The turn
+# rates and radii are computed once, so each call only evaluates the positions (6, 8)
+    g = MainAircraft.g
+    rate_a = g*np.tan(bank_angle_a)/airspeed_a
+    rate_b = g*np.tan(bank_angle_b)/airspeed_b
+    turning_a = rate_a != 0
+    turning_b = rate_b != 0
+    radius_a = airspeed_a/np.where(turning_a, rate_a, 1) # signed, V/omega
+    radius_b = airspeed_b/np.where(turning_b, rate_b, 1)
+    sin_h = np.sin(heading_b)
+    cos_h = np.cos(heading_b)
+
+    def separation(t):
+        x_a = np.where(turning_a, radius_a*(1 - np.cos(rate_a*t)), 0)
+        y_a = np.where(turning_a, radius_a*np.sin(rate_a*t), airspeed_a*t)
+        heading = heading_b + rate_b*t
+        x_b = b0_x + np.where(turning_b, radius_b*(cos_h - np.cos(heading)), airspeed_b*sin_h*t)
+        y_b = b0_y + np.where(turning_b, radius_b*(np.sin(heading) - sin_h), airspeed_b*cos_h*t)
+        return np.sqrt((x_b - x_a)**2 + (y_b - y_a)**2)
+    return separation
+
+def maneuver_turn_angles(turn_angles, airspeed_a, airspeed_b, bank_angle_a, bank_angle_b):
+# Maps a sweep of (unsigned) turn angles onto maneuvers given by the bank angles of A and B in radians. The sign of
+# a bank angle gives the turn direction and a bank angle of 0 means the aircraft flies straight. The sweep belongs
+# to A unless only B turns, and in cooperative maneuvers B turns for as long as A. All arguments broadcast, so
+# several maneuvers can be mapped at once. Returns the signed sweep, turn times and the turn angles of A and B
+    g = MainAircraft.g
+    turning_a = np.asarray(bank_angle_a) != 0
+    bank_angle = np.where(turning_a, bank_angle_a, bank_angle_b)
+    airspeed = np.where(turning_a, airspeed_a, airspeed_b)
+    turn_angles = turn_angles*np.sign(bank_angle)
+    turn_times = turn_angles*airspeed/g/np.tan(bank_angle)
+    turn_angles_a = np.where(turning_a, turn_angles, 0)
+    turn_angles_b = np.where(turning_a, turn_times*g*np.tan(bank_angle_b)/airspeed_b, turn_angles)
+    return turn_angles, turn_times, turn_angles_a, turn_angles_b
+
+#### Memoized turn geometry ####
+
+class TurnGeometry(NamedTuple):
+# Turn of one aircraft over a grid of turn angles: where it turns (a zero turn angle flies straight), turn radius
+# (2), turn times (3), position at the end of the turn in the aircraft's own frame (6), and sine and cosine of the
+# heading change. Entries that fly straight have zero time, position and heading change
+    turning: np.ndarray
+    radius: np.ndarray
+    times: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    sin: np.ndarray
+    cos: np.ndarray
+
+def turn_geometry(airspeed, bank_angle, turn_angles):
+# TurnGeometry of an aircraft at the given airspeed over turn angles (rad) at bank angles (rad) that broadcast
+# against them, as in turn_end_positions
+    turning = turn_angles != 0
+    rate = MainAircraft.g*np.tan(bank_angle)/airspeed
+    rate = np.where(turning, rate, 1) # signed turn rate where turning
+    radius = np.where(turning, airspeed/np.abs(rate), 0) # (2)
+    times = np.where(turning, turn_angles/rate, 0) # (3)
+    sin = np.sin(turn_angles)
+    cos = np.cos(turn_angles)
+    sign = np.sign(turn_angles)
+    return TurnGeometry(turning, radius, times, radius*sign*(1 - cos), radius*sign*sin, sin, cos) # (6)
+
+class GeometryCache:
+# Thread-safe LRU cache of TurnGeometry keyed on the exact airspeed, bank angles and turn angle grid. Entries are
+# shared by aircraft with the same airspeed: the encounters of a speed class in BatchResolution.resolve_maneuver,
+# whose airspeeds are rounded to the class, and repeated resolve_all and maneuver method sweeps of a ManeuverData.
+# The lock only guards the entries, so concurrent misses on one key may both compute it
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, airspeed, bank_angle, turn_angles):
+    # Geometry for a grid of turn angles (rad), computed on a miss for the given airspeed and bank angles
+        turn_angles = np.ascontiguousarray(turn_angles, dtype=float)
+        bank_angle = np.ascontiguousarray(bank_angle, dtype=float)
+        key = (float(airspeed), bank_angle.shape, bank_angle.tobytes(), turn_angles.shape, turn_angles.tobytes())
+        with self.lock:
+            geometry = self.entries.get(key)
+            if geometry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return geometry
+            self.misses += 1
+
+        geometry = turn_geometry(float(airspeed), bank_angle, turn_angles)
+        for array in geometry:
+            array.flags.writeable = False
+        with self.lock:
+            self.entries[key] = geometry
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return geometry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+geometry_cache = GeometryCache()
+
+def cached_separation_kernel(b0_x, b0_y, heading_b, airspeed_a, airspeed_b, geometry_a, geometry_b):
+# separation_kernel for encounters that share the airspeeds of A and B, using their cached turn geometry on the
+# same grid instead of evaluating the trigonometry per encounter. An aircraft flies straight where its turn angle
+# is zero, for the duration of the other's turn. B's turn (8) is A's turn (6) rotated by B's initial heading, and
+# the headings after the turn follow from the sum formulas
+    cos_h = np.cos(heading_b)
+    sin_h = np.sin(heading_b)
+    t = np.where(geometry_a.turning, geometry_a.times, geometry_b.times)
+
+    x_a1 = geometry_a.x
+    y_a1 = np.where(geometry_a.turning, geometry_a.y, airspeed_a*t)
+    x_b = geometry_b.x
+    y_b = np.where(geometry_b.turning, geometry_b.y, airspeed_b*t)
+    x_b1 = b0_x + cos_h*x_b + sin_h*y_b
+    y_b1 = b0_y - sin_h*x_b + cos_h*y_b
+    sin_a, cos_a = geometry_a.sin, geometry_a.cos
+    sin_b = sin_h*geometry_b.cos + cos_h*geometry_b.sin
+    cos_b = cos_h*geometry_b.cos - sin_h*geometry_b.sin
+
+    dx1 = x_b1 - x_a1
+    dy1 = y_b1 - y_a1
+    Vrx = airspeed_b*sin_b - airspeed_a*sin_a
+    Vry = airspeed_b*cos_b - airspeed_a*cos_a
+    return straight_segment(dx1, dy1, Vrx, Vry)
+
+def local_maxima(values):
+# Mask of the strict interior local maxima along the last axis, as signal.argrelmax without loading SciPy
+    values = np.asarray(values)
+    is_max = np.zeros(values.shape, dtype=bool)
+    is_max[..., 1:-1] = (values[..., 1:-1] > values[..., :-2]) & (values[..., 1:-1] > values[..., 2:])
+    return is_max
+
+#### Plotting ####
+
+def plot_separation(turn_angles, separation, separation_straight, resolution_times, title):
+# Plots separation curves (nm) and resolution times (min) over turn angles (deg). Matplotlib is only imported here,
+# so the numerical code runs headless
+    import matplotlib.pyplot as plt
+    plt.plot(turn_angles, separation)
+    plt.plot(turn_angles, separation_straight)
+    plt.plot(turn_angles, np.array(resolution_times)/60)
+    plt.title(title)
+    plt.ylabel('Separation (nm)')
+    plt.xlabel('Turn Angle (deg)')
+    plt.grid()
+    plt.show()
+
+#### Continuous minimization ####
+
+golden_ratio = (np.sqrt(5) - 1)/2
+
+def golden_section_min(f, lower, upper, tol):
+# Minimizes f between lower and upper by golden-section search until the bracket is narrower than tol. The bounds
+# may be arrays, in which case all brackets are searched in parallel with one call of f per iteration. Returns the
+# minimizing argument and value
+    lower, upper = np.broadcast_arrays(np.asarray(lower, dtype=float), np.asarray(upper, dtype=float))
+    lower = lower.copy()
+    upper = upper.copy()
+    x1 = upper - golden_ratio*(upper - lower)
+    x2 = lower + golden_ratio*(upper - lower)
+    f1 = f(x1)
+    f2 = f(x2)
+    width = np.max(upper - lower, initial=0)
+    iterations = int(np.ceil(np.log(tol/width)/np.log(golden_ratio))) if width > tol else 0
+    for _ in range(iterations):
+        # Minimum lies in [lower, x2] if f1 < f2, otherwise in [x1, upper]. Only one new point is evaluated
+        left = f1 < f2
+        upper = np.where(left, x2, upper)
+        lower = np.where(left, lower, x1)
+        x_new = np.where(left, upper - golden_ratio*(upper - lower), lower + golden_ratio*(upper - lower))
+        f_new = f(x_new)
+        x1, x2 = np.where(left, x_new, x2), np.where(left, x1, x_new)
+        f1, f2 = np.where(left, f_new, f2), np.where(left, f1, f_new)
+    left = f1 < f2
+    return np.where(left, x1, x2), np.where(left, f1, f2)
+
+def turn_minimum(turn_separation, turn_times, index, tol=1e-3, samples=17):
+# Minimum separation in turn, refined from the sample `index` of turn time sweeps along the last axis to tol
+# seconds. The interval between the neighbouring samples is resampled at `samples` points in one call and narrowed
+# to the neighbours of the smallest, which shrinks it (samples - 1)/2 times per call; with few rows this takes far
+# fewer calls than golden_section_min. turn_separation(t) is the separation at the end of turns of t seconds (see
+# separation_in_turn), called with the leading axes plus a trailing axis of samples. Used by resolution_data and
+# the maneuver methods alike. Returns d_tmin and the turn time at which it occurs
+    last = turn_times.shape[-1] - 1
+    lower = np.take_along_axis(turn_times, np.maximum(index - 1, 0)[..., None], axis=-1)
+    upper = np.take_along_axis(turn_times, np.minimum(index + 1, last)[..., None], axis=-1)
+    fractions = np.linspace(0, 1, samples)
+    while True:
+        t = lower + (upper - lower)*fractions
+        separation = turn_separation(t)
+        k = np.argmin(separation, axis=-1)[..., None]
+        if np.max(upper - lower, initial=0)/(samples - 1) <= tol:
+            return np.take_along_axis(separation, k, axis=-1)[..., 0], np.take_along_axis(t, k, axis=-1)[..., 0]
+        lower = np.take_along_axis(t, np.maximum(k - 1, 0), axis=-1)
+        upper = np.take_along_axis(t, np.minimum(k + 1, samples - 1), axis=-1)
+
+#### Resolution logic for arrays of turn angle sweeps ####
+
+resolution_types = np.array(['1', '1a', '2a', '2b'])
+
+def resolution_data(separation, t_smin, d_smin, turn_angles, turn_times, d_req, turn_separation=None):
+# Picks the resolution from turn angle sweeps along the last axis, with the same rules as the ManeuverData
+# maneuver methods. Leading axes (e.g. encounters) are resolved independently. Resolution types are returned as
+# indices into resolution_types. Given turn_separation (see separation_in_turn), the minimum separation in turn is
+# refined with turn_minimum as in the maneuver methods, otherwise the sample minimum is used
+    separation, t_smin, d_smin, turn_angles, turn_times = np.broadcast_arrays(
+        separation, t_smin, d_smin, turn_angles, turn_times)
+    j = np.arange(separation.shape[-1])
+
+    def take(array, index):
+        return np.take_along_axis(array, index[..., None], axis=-1)[..., 0]
+
+    # Find minimum turn separation, corresponding time and turn angle
+    index = np.argmin(separation, axis=-1)
+    if turn_separation is None:
+        d_tmin = take(separation, index)
+        turn_angle_min = take(turn_angles, index)
+        turn_time_min = take(turn_times, index)
+    else:
+        # Turn angles are proportional to turn times along each sweep
+        d_tmin, turn_time_min = turn_minimum(turn_separation, turn_times, index)
+        rate = turn_angles[..., -1]/np.where(turn_times[..., -1] != 0, turn_times[..., -1], 1)
+        turn_angle_min = turn_time_min*rate
+
+    # Plots of minimum separation in straight line meet turn separation at min turn separation
+    separation_straight = np.where(j > index[..., None], separation, d_smin)
+    resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
+
+    # Check for any maxima prior to locus merge (first interior local max)
+    s = separation_straight
+    is_max = local_maxima(s)
+    has_max = is_max.any(axis=-1)
+    first_max = np.argmax(is_max, axis=-1)
+
+    # Try for type 1 resolution
+    above = s > d_req
+    type_1 = ((d_tmin >= d_req) | (has_max & (take(s, first_max) >= d_req))) & above.any(axis=-1)
+    index_1 = np.argmin(np.where(above, s, np.inf), axis=-1)
+    time_1 = take(resolution_times, index_1)
+    # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a solution
+    violated = type_1 & ((time_1 > 1.2*turn_time_min) | (has_max & (index_1 > first_max) & (index_1 < index)))
+    type_1a = violated & (d_tmin > d_req)
+    type_1 = type_1 & ~violated
+
+    # Best parameters for type 2 resolutions
+    after = j >= index[..., None]
+    above_after = after & (separation > d_req)
+    type_2a = above_after.any(axis=-1)
+    index_2 = np.where(type_2a, np.argmin(np.where(above_after, separation, np.inf), axis=-1),
+                       np.argmax(np.where(after, separation, -np.inf), axis=-1))
+
+    resolution_type = np.select([type_1, type_1a, type_2a], [0, 1, 2], 3)
+    resolution_index = np.select([type_1], [index_1], index_2)
+    return {'resolution_type': resolution_type,
+            'resolution_angle': np.where(type_1a, turn_angle_min, take(turn_angles, resolution_index)),
+            'resolution_time': np.select([type_1], [time_1], turn_time_min),
+            'min_separation': np.select([type_1], [take(s, index_1)], d_tmin),
+            'd_tmin': d_tmin,
+            'turn_angle_min': turn_angle_min,
+            'turn_time_min': turn_time_min}
+
+def resolution_order(resolution_type, min_separation):
+# Ranks the maneuvers along the first axis, from best to worst: successful resolutions (type 1, then 1a) before
+# failures (type 2a and 2b), failures by decreasing min separation, ties in the order of maneuvers. Resolution
+# types are indices into resolution_types; returns the maneuver indices in rank order along the first axis
+    resolution_type, min_separation = np.broadcast_arrays(resolution_type, min_separation)
+    failed = resolution_type >= 2
+    preference = np.arange(len(resolution_type)).reshape((-1,) + (1,)*(resolution_type.ndim - 1))
+    return np.lexsort((np.broadcast_to(preference, resolution_type.shape), resolution_type,
+                       np.where(failed, -min_separation, 0), failed), axis=0)
+
+#### Compact resolution records ####
+
+class Resolution(NamedTuple):
+# Outcome of one maneuver in one direction, in SI units (m, rad, s). The separation curves over the swept turn
+# angles are only kept on request
+    maneuver: str
+    resolution_type: str
+    min_separation: float
+    resolution_angle: float
+    resolution_time: float
+    d_tmin: float
+    turn_angle_min: float
+    turn_time_min: float
+    turn_angles: np.ndarray = None
+    separation: np.ndarray = None
+    separation_straight: np.ndarray = None
+    resolution_times: np.ndarray = None
+
+record_fields = Resolution._fields[:8] # scalar fields, exported in bulk
+
+def resolution_table(results):
+# Structured array with one row per resolution, from a sequence of Resolution records or a dictionary of equal
+# length arrays such as the output of BatchResolution.resolve_batch
+    if isinstance(results, np.ndarray):
+        return results
+    if isinstance(results, dict):
+        columns = {key: np.asarray(column) for key, column in results.items()}
+    else:
+        columns = {field: np.asarray([getattr(result, field) for result in results]) for field in record_fields}
+    table = np.empty(len(next(iter(columns.values()))), dtype=[(key, column.dtype) for key, column in columns.items()])
+    for key, column in columns.items():
+        table[key] = column
+    return table
+
+def write_resolutions(filename, results):
+# Writes resolutions in bulk: CSV with a header line for a .csv filename, otherwise one binary array per column
+# in a .npz archive. Curves are not exported
+    table = resolution_table(results)
+    if filename.endswith('.csv'):
+        formats = ['%s' if table.dtype[key].kind in 'US' else '%.10g' for key in table.dtype.names]
+        np.savetxt(filename, table, fmt=formats, delimiter=',', header=','.join(table.dtype.names), comments='')
+    else:
+        np.savez(filename, **{key: table[key] for key in table.dtype.names})
+
+def read_resolutions(filename):
+# Reads resolutions written by write_resolutions back into a structured array
+    if filename.endswith('.csv'):
+        with open(filename) as file:
+            names = file.readline().strip().split(',')
+        values = np.loadtxt(filename, delimiter=',', dtype=str, skiprows=1, ndmin=2).T
+        columns = dict()
+        for name, column in zip(names, values):
+            try:
+                columns[name] = column if name in ('maneuver', 'resolution_type') else column.astype(float)
+            except ValueError:
+                columns[name] = column
+        return resolution_table(columns)
+    with np.load(filename) as archive:
+        return resolution_table(dict(archive))
+
 class ManeuverData:
     def __init__(self, aircraft_a, aircraft_b):
         self.a = aircraft_a
         self.b = aircraft_b
         self.d_req = 9260 # 5 nautical miles in meters
+        self.refine_time = None # expected duration of a solve_maneuver refinement in resolve_anytime [s]
 
     #### Functions for turn segment ####
 
@@ -110,62 +536,392 @@ class ManeuverData:
                           *np.sin(heading0 + dphi_b) - R_a*np.sign(dphi_a)*np.sin(dphi_a))**2 )
         return dab
 
+    def get_d_tmin(self, separation, turner, t_end, t_start=0, samples=16, tol=1e-3):
+    # Exact minimum separation in turn. separation is one of get_da, get_db or get_dab for the current bank angles
+    # and turner the aircraft whose turn angle is returned (A in cooperative turns). Samples the turn time interval
+    # [t_start, t_end] to bracket the minimum, then refines it by golden-section search to tol seconds. Returns
+    # d_tmin, the time into the turn and the turn angle of the turner
+        t = np.linspace(t_start, t_end, samples)
+        k = np.argmin(separation(t))
+        t_min, d_tmin = golden_section_min(separation, t[max(k - 1, 0)], t[min(k + 1, samples - 1)], tol)
+        return float(d_tmin), float(t_min), float(turner.turn_angle_(t_min))
+
+    def turn_separation(self, bank_angle_a, bank_angle_b):
+    # Separation at the end of turns as a function of turn time for bank angles in radians (separation_in_turn)
+        b0 = self.b.initial_position
+        return separation_in_turn(b0[0], b0[1], self.b.initial_heading, self.a.airspeed, self.b.airspeed,
+                                  bank_angle_a, bank_angle_b)
+
     #### Functions for straight line segment ####
 
+    def get_maneuver_data(self, turn_angle_a, turn_angle_b):
+    # Fused kernel over arrays of turn angles. Returns separation at the end of the turn (10, 11, 13), time after
+    # turn ends of min separation in straight line segment (18) and min separation in straight line segment (19)
+        b0 = self.b.initial_position
+        return separation_kernel(b0[0], b0[1], self.b.initial_heading, self.a.airspeed, self.b.airspeed,
+                                 self.a.bank_angle, self.b.bank_angle, turn_angle_a, turn_angle_b)
+
+    def get_sweep_data(self, turn_angle_a, turn_angle_b):
+    # get_maneuver_data for the turn angle sweeps of the maneuver methods, with the turn geometry from
+    # geometry_cache. Continuous searches such as solve_maneuver use get_maneuver_data, so they do not fill the cache
+        b0 = self.b.initial_position
+        geometry_a = geometry_cache.get(self.a.airspeed, self.a.bank_angle, turn_angle_a)
+        geometry_b = geometry_cache.get(self.b.airspeed, self.b.bank_angle, turn_angle_b)
+        return cached_separation_kernel(b0[0], b0[1], self.b.initial_heading, self.a.airspeed, self.b.airspeed,
+                                        geometry_a, geometry_b)
+
     def get_t_smin(self, turn_angle_a, turn_angle_b): 
     # time after turn ends of min separation in straight line segment (18)
-        if turn_angle_a == 0 and turn_angle_b == 0:
-            p_a1 = self.a.initial_position
-            p_b1 = self.b.initial_position
-        else:
-            if turn_angle_a == 0: 
-                p_a1 = np.array([0, self.a.airspeed*self.b.time_to_turn(turn_angle_b)])
-            else:
-                p_a1 = self.a.turn_position(self.a.time_to_turn(turn_angle_a))
-            if turn_angle_b == 0:
-                p_b1 = np.array([self.b.initial_position[0] + self.b.airspeed*np.sin(self.b.initial_heading)*self.a.time_to_turn(turn_angle_a),
-                         self.b.initial_position[1] + self.b.airspeed*np.cos(self.b.initial_heading)*self.a.time_to_turn(turn_angle_a)])
-            else:
-                p_b1 = self.b.turn_position(self.b.time_to_turn(turn_angle_b))
-
-        dx1 = p_b1[0] - p_a1[0]
-        dy1 = p_b1[1] - p_a1[1]
-        heading_a = turn_angle_a
-        heading_b = turn_angle_b + self.b.initial_heading
-        Vrx = self.b.airspeed*np.sin(heading_b) - self.a.airspeed*np.sin(heading_a)
-        Vry = self.b.airspeed*np.cos(heading_b) - self.a.airspeed*np.cos(heading_a)
-        t_smin = -(dx1*Vrx + dy1*Vry)/(Vrx**2 + Vry**2)
-        return t_smin
+        return self.get_maneuver_data(turn_angle_a, turn_angle_b)[1]
 
     def get_d_smin(self, turn_angle_a, turn_angle_b):
     # min separation in straight line segment (19) 
-        if turn_angle_a == 0 and turn_angle_b == 0:
-            p_a1 = self.a.initial_position
-            p_b1 = self.b.initial_position
+        return self.get_maneuver_data(turn_angle_a, turn_angle_b)[2]
+
+    #### Evaluation of all maneuvers ####
+
+    def resolve_all(self, turn_angles=np.deg2rad(np.arange(0, 150, 2)), count=len(maneuvers)):
+    # Evaluates all 12 maneuvers (or the `count` most preferred) in one broadcasted pass over (maneuver x turn angle)
+    # and returns them ranked by resolution_order: successful resolutions (type 1, then 1a) before failures
+    # (type 2a and 2b, where separation is lost in the turn), failures by decreasing min separation, ties in the
+    # order of maneuvers
+        bank_angles = np.deg2rad([[bank_a, bank_b] for _, bank_a, bank_b in maneuvers[:count]])
+        bank_a = bank_angles[:, :1]
+        bank_b = bank_angles[:, 1:]
+        b0 = self.b.initial_position
+
+        sweep, turn_times, turn_angles_a, turn_angles_b = maneuver_turn_angles(
+            turn_angles, self.a.airspeed, self.b.airspeed, bank_a, bank_b)
+        geometry_a = geometry_cache.get(self.a.airspeed, bank_a, turn_angles_a)
+        geometry_b = geometry_cache.get(self.b.airspeed, bank_b, turn_angles_b)
+        separation, t_smin, d_smin = cached_separation_kernel(b0[0], b0[1], self.b.initial_heading, self.a.airspeed,
+                                                              self.b.airspeed, geometry_a, geometry_b)
+        data = resolution_data(separation, t_smin, d_smin, sweep, turn_times, self.d_req,
+                               separation_in_turn(b0[0], b0[1], self.b.initial_heading, self.a.airspeed,
+                                                  self.b.airspeed, bank_a, bank_b))
+
+        results = []
+        for i in resolution_order(data['resolution_type'], data['min_separation']):
+            label = maneuvers[i][0]
+            resolution_type = str(resolution_types[data['resolution_type'][i]])
+            results.append({'maneuver': label,
+                            'resolution_type': resolution_type,
+                            'failed': resolution_type in ('2a', '2b'),
+                            'resolution_angle': float(data['resolution_angle'][i]),
+                            'resolution_time': float(data['resolution_time'][i]),
+                            'min_separation': float(data['min_separation'][i]),
+                            'd_tmin': float(data['d_tmin'][i])})
+        return results
+
+    def resolve_anytime(self, budget, stages=anytime_stages, refine=True):
+    # Anytime resolution within a time budget in seconds. Runs the stages of resolve_all from a coarse grid and the
+    # most preferred maneuvers to the full 2 deg sweep, then refines the best maneuver with solve_maneuver. A stage
+    # only starts if its cost, predicted from the previous stage per evaluated grid point, fits in the remaining
+    # budget; the first stage always runs. A refinement whose resolution type is worse than the grid's is
+    # discarded. Returns the best resolution found (as in resolve_all) with a quality estimate: the stage reached,
+    # grid step (0 once refined), maneuvers evaluated, separation margin over d_req, elapsed time and whether a
+    # refinement completed and was kept. Refinement only starts if the expected refinement time fits in the
+    # remaining budget. The estimate is seeded by warm_refinement, which imports SciPy before the budget starts
+    # (call it once at setup to keep that out of the first resolution), and follows this instance's refinements,
+    # each weighing in at most 4 times the current estimate
+        if refine and self.refine_time is None:
+            self.refine_time = warm_refinement()
+        start = time.perf_counter()
+        deadline = start + budget
+        best = None
+        cost = None # seconds per grid point evaluation of the last stage
+        quality = {'stage': 0, 'stages': len(stages) + refine, 'step': None, 'maneuvers': 0}
+        for k, (count, step) in enumerate(stages):
+            grid = np.deg2rad(np.append(np.arange(0, 148, step), 148))
+            if best is not None and time.perf_counter() + cost*count*grid.size > deadline:
+                break
+            stage_start = time.perf_counter()
+            best = self.resolve_all(grid, count)[0]
+            cost = (time.perf_counter() - stage_start)/(count*grid.size)
+            quality.update(stage=k + 1, step=step, maneuvers=count)
+
+        # Continuous refinement of the chosen maneuver, budgeted by the duration of the last refinement
+        if refine and quality['stage'] == len(stages) and time.perf_counter() + self.refine_time <= deadline:
+            bank_a, bank_b = next((bank_a, bank_b) for label, bank_a, bank_b in maneuvers
+                                  if label == best['maneuver'])
+            refine_start = time.perf_counter()
+            solution = self.solve_maneuver(bank_a, bank_b)
+            duration = min(time.perf_counter() - refine_start, 4*self.refine_time)
+            self.refine_time += 0.25*(duration - self.refine_time)
+            # Keep the refinement only if its resolution type is no worse than the grid's
+            if (np.flatnonzero(resolution_types == solution['resolution_type'])[0]
+                    <= np.flatnonzero(resolution_types == best['resolution_type'])[0]):
+                best = dict(best, **{key: solution[key] for key in ('resolution_type', 'resolution_angle',
+                                                                     'resolution_time', 'min_separation', 'd_tmin')})
+                best['failed'] = best['resolution_type'] in ('2a', '2b')
+                quality.update(stage=quality['stages'], step=0)
+
+        quality['margin'] = best['min_separation'] - self.d_req
+        quality['elapsed'] = time.perf_counter() - start
+        quality['complete'] = quality['stage'] == quality['stages']
+        return dict(best, quality=quality)
+
+    #### Iterative solution of resolution angles ####
+
+    def solve_maneuver(self, bank_angle_a, bank_angle_b, step=10, xtol=1e-4, warm=None, window=np.deg2rad(0.5),
+                       max_evaluations=75):
+    # Resolution for one maneuver without the fixed 2 deg sweep. Bank angles are in degrees, the sign gives the turn
+    # direction and 0 means the aircraft flies straight. A coarse sweep in steps of `step` deg brackets the
+    # d_smin = d_req crossing and the first maximum of d_smin, which are then refined with Brent's method to `xtol`
+    # rad. Returns the resolution as a dictionary with the same keys as resolution_data, plus the number of kernel
+    # evaluations used and the unsigned sweep angles of the features it was derived from. SciPy is only imported
+    # when the solver is used
+    #
+    # The resolution angle is the first upward d_req crossing. A sweep instead takes the sample with the smallest
+    # separation above d_req, which can belong to a later crossing when the curve crosses d_req more than once, so
+    # the two need not agree on such curves even for fine sweeps. Features narrower than `step` can also be missed
+    #
+    # Given the result of a previous solve as `warm`, the features are instead tracked from their previous angles in
+    # brackets that start `window` rad wide and widen until the feature is found, so the work grows with how far
+    # the features moved. Returns None if a feature cannot be tracked (it moved far or appeared or disappeared) or
+    # the resolution type changed, in which case the caller should solve from scratch
+    #
+    # A solve never uses more than max_evaluations kernel evaluations, by default the 75 of the fixed 2 deg sweep.
+    # The coarse sweep takes 16 at the default step, and every Brent refinement may use an equal share of what is
+    # left for the refinements that can still follow, stopping coarser than `xtol` when its share runs out. A warm
+    # solve that would need more returns None
+        from scipy import optimize
+        self.a.bank_angle_(np.deg2rad(bank_angle_a))
+        self.b.bank_angle_(np.deg2rad(bank_angle_b))
+        evaluations = 0
+        reserve = 3 # evaluations outside the refinements: the jump at the merge in rising and the final kernel
+        top = np.deg2rad(148) # end of the sweep, as in the maneuver methods
+
+        def turn(turn_angles):
+        # Signed turn angles, turn times and turn angles of A and B for the unsigned sweep angles
+            return maneuver_turn_angles(np.asarray(turn_angles, dtype=float), self.a.airspeed, self.b.airspeed,
+                                        self.a.bank_angle, self.b.bank_angle)
+
+        def kernel(turn_angles):
+        # Turn time, separation at end of turn and straight segment data for the unsigned sweep angles
+            nonlocal evaluations
+            evaluations += np.size(turn_angles)
+            turn_angles, turn_times, turn_angles_a, turn_angles_b = turn(turn_angles)
+            return (turn_angles, turn_times) + self.get_maneuver_data(turn_angles_a, turn_angles_b)
+
+        def allowance(later):
+        # Kernel evaluations a refinement may use, sharing the budget left after the reserve equally with up to
+        # `later` refinements that may follow it
+            return (max_evaluations - evaluations - reserve)//(later + 1)
+
+        def turn_separation(angle):
+            separation = kernel(angle)[2]
+            return float(separation) if np.ndim(separation) == 0 else separation
+
+        def merged(angle):
+        # Continuous version of separation_straight, switching from d_smin to turn separation past the turn minimum
+            _, _, separation, _, d_smin = kernel(angle)
+            separation = np.where(np.asarray(angle) > merge, separation, d_smin)
+            return float(separation) if separation.ndim == 0 else separation
+
+        def refine_max(curve, lower, upper, guess, value, later):
+        # Maximum of `curve` between lower and upper by Brent's method, or the guess with its value if that is higher
+            lower, upper = max(lower, 0), min(upper, top)
+            maxfun = allowance(later)
+            if maxfun < 2:
+                return guess, value
+            solution = optimize.minimize_scalar(lambda angle: -curve(angle), method='bounded',
+                                                bounds=(lower, upper), options={'xatol': xtol, 'maxiter': maxfun})
+            if -solution.fun < value:
+                return guess, value
+            return solution.x, -solution.fun
+
+        def samples(curve, lower, upper, count=9):
+        # Samples `curve` at count angles spanning [lower, upper] in a single kernel call
+            angles = np.linspace(max(lower, 0), min(upper, top), count)
+            return angles, curve(angles)
+
+        def track_max(curve, guess):
+        # Maximum of `curve` near its previous angle: the bracket is sampled in one kernel call, widened while the
+        # sampled maximum lies on its edge, and the maximum is refined at the vertex of a parabola through the best
+        # sample and its neighbours
+            width = window
+            while width < np.pi/2 and allowance(0) >= 10:
+                angles, values = samples(curve, guess - width, guess + width)
+                k = np.argmax(values)
+                if 0 < k < angles.size - 1:
+                    h = angles[1] - angles[0]
+                    curvature = values[k - 1] - 2*values[k] + values[k + 1]
+                    if curvature < 0:
+                        angle = angles[k] + h*(values[k - 1] - values[k + 1])/(2*curvature)
+                        value = float(curve(angle))
+                        if value > values[k]:
+                            return angle, value
+                    return angles[k], values[k]
+                if angles[k] <= 0 or angles[k] >= top:
+                    return angles[k], values[k]
+                guess, width = angles[k], 4*width
+            return None
+
+        def root(curve, lower, upper, later):
+        # Brent's method for curve = d_req between a sample below and one above d_req, nudged up to the first angle
+        # at which the curve is above d_req, so the result never reports less than d_req. Brent's method evaluates
+        # both ends and then once per iteration, and the nudge up to twice
+            maxiter = allowance(later) - 4
+            if maxiter < 0:
+                return upper
+            angle = optimize.brentq(lambda angle: curve(angle) - self.d_req, lower, upper, xtol=xtol,
+                                    maxiter=maxiter, disp=False)
+            return next((angle for angle in (angle, min(angle + 2*xtol, upper)) if curve(angle) > self.d_req),
+                        upper)
+
+        def rising(curve, angles, values, later=0):
+        # First upward crossing of d_req by `curve` between ascending sample angles, or the first sample if it is
+        # already above d_req. On merged a bracket across `merge` is split there, since the jump from d_smin up to
+        # turn separation is not a root: if the curve only rises above d_req at the jump, the first angle past it is
+        # returned, where merged is the turn separation, as a sweep would pick
+            above = values > self.d_req
+            if above[0]:
+                return angles[0]
+            for k in np.flatnonzero(~above[:-1] & above[1:]):
+                lower, upper = angles[k], angles[k + 1]
+                if curve is not merged or not lower <= merge < upper:
+                    return root(curve, lower, upper, later)
+                if merged(merge) > self.d_req:
+                    return root(merged, lower, merge, later)
+                if turn_separation(merge) <= self.d_req:
+                    return root(turn_separation, merge, upper, later)
+                return min(merge + xtol, upper)
+            return None
+
+        def track_crossing(curve, guess):
+        # Upward crossing of d_req by `curve` near its previous angle: the bracket is sampled in one kernel call and
+        # widened until it contains a crossing, which is then refined by Brent's method between two samples
+            width = window
+            while width < np.pi/2 and allowance(0) >= 10:
+                angles, values = samples(curve, guess - width, guess + width)
+                if angles[0] == 0 and values[0] > self.d_req:
+                    return 0.0
+                rises = np.flatnonzero((values[:-1] <= self.d_req) & (values[1:] > self.d_req))
+                crossings = [angle for angle in (rising(curve, angles[k:k + 2], values[k:k + 2]) for k in rises)
+                             if angle is not None]
+                if crossings:
+                    return min(crossings, key=lambda angle: abs(angle - guess))
+                width = 4*width
+            return None
+
+        if warm is None:
+            # Coarse sweep over the same 0 to 148 deg range as the maneuver methods
+            grid = np.deg2rad(np.append(np.arange(0, 148, step), 148))
+            turn_angles, turn_times, separation, t_smin, d_smin = kernel(grid)
+            index = np.argmin(separation)
+
+            def crossing(curve, samples, start, later):
+            # Smallest sweep angle from index `start` on at which `curve` rises above d_req, refined by Brent's method
+                return rising(curve, grid[start:], samples[start:], later)
+
+            def maximize(curve, samples, k, later):
+            # Refines the maximum of `curve`, sampled as `samples` with its largest at index k, between its neighbours
+                return refine_max(curve, grid[max(k - 1, 0)], grid[min(k + 1, grid.size - 1)], grid[k], samples[k],
+                                  later)
+
+            # Find minimum turn separation, where the plots of minimum separation in straight line meet turn
+            # separation (the same merge point as warm solves), and check for any maxima prior to locus merge. The
+            # refinements that can follow are the two maxima, the d_req crossing and the type 2 crossing or maximum
+            sweep_min, d_tmin = maximize(lambda angle: -turn_separation(angle), -separation, index, 4)
+            merge = sweep_min
+            separation_straight = np.where(grid > merge, separation, d_smin)
+            maximum = np.flatnonzero(local_maxima(separation_straight))
+            sweep_max, separation_max = (maximize(merged, separation_straight, maximum[0], 3) if maximum.size > 0
+                                         else (None, None))
+            if separation_straight[0] > separation_straight[1]:
+                # A first maximum between the first two samples shows as a falling edge
+                angle, value = refine_max(merged, 0, grid[1], 0, separation_straight[0], 2)
+                if angle > 0:
+                    sweep_max, separation_max = angle, value
+            if sweep_max is not None:
+                # The refined maximum may rise above d_req between samples that all stay below it
+                k = np.searchsorted(grid, sweep_max)
+                angles = np.insert(grid, k, sweep_max)
+                values = np.insert(separation_straight, k, separation_max)
+            else:
+                angles, values = grid, separation_straight
+            find_crossing = lambda: rising(merged, angles, values, 1)
+            find_crossing_2 = lambda: crossing(turn_separation, separation, index, 0)
+            find_max_2 = lambda: maximize(turn_separation, separation, index + np.argmax(separation[index:]), 0)[0]
         else:
-            if turn_angle_a == 0: 
-                p_a1 = np.array([0, self.a.airspeed*self.b.time_to_turn(turn_angle_b)])
+            # Track the previous features
+            tracked = track_max(lambda angle: -turn_separation(angle), warm['sweep_min'])
+            if tracked is None:
+                return None
+            sweep_min, d_tmin = tracked
+            merge = sweep_min
+            sweep_max, separation_max = None, None
+            if warm['sweep_max'] is not None:
+                tracked = track_max(merged, warm['sweep_max'])
+                if tracked is None:
+                    return None
+                sweep_max, separation_max = tracked
+            guess = warm['sweep_crossing'] if warm['sweep_crossing'] is not None else warm['sweep_resolution']
+            find_crossing = lambda: track_crossing(merged, guess)
+            find_crossing_2 = lambda: track_crossing(turn_separation, warm['sweep_resolution'])
+            find_max_2 = lambda: (track_max(turn_separation, warm['sweep_resolution']) or (None,))[0]
+        d_tmin = -d_tmin
+        turn_angle_min, turn_time_min = turn(sweep_min)[:2]
+
+        # Try for type 1 resolution
+        resolution_type = '2'
+        sweep_crossing = None
+        if d_tmin >= self.d_req or (sweep_max is not None and separation_max >= self.d_req):
+            sweep_crossing = angle = find_crossing()
+            if angle is not None:
+                resolution_type = '1'
+                resolution_angle, resolution_time, separation_end, t, separation_min = kernel(angle)
+                min_separation = separation_end if angle > merge else separation_min
+                resolution_time = resolution_time + max(t, 0)
+                # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a
+                if resolution_time > 1.2 * turn_time_min or (sweep_max is not None and sweep_max < angle < sweep_min):
+                    if d_tmin > self.d_req:
+                        resolution_type = '1a'
+                        angle = sweep_min
+                        min_separation = d_tmin
+                        resolution_angle = turn_angle_min
+                        resolution_time = turn_time_min
+                    else: resolution_type = '2'
+
+        # Give best resolution parameters to type 2 solutions
+        if resolution_type == '2':
+            min_separation = d_tmin
+            resolution_time = turn_time_min
+            if warm is None or warm['resolution_type'] == '2a':
+                angle = find_crossing_2()
             else:
-                p_a1 = self.a.turn_position(self.a.time_to_turn(turn_angle_a))
-            if turn_angle_b == 0:
-                p_b1 = np.array([self.b.initial_position[0] + self.b.airspeed*np.sin(self.b.initial_heading)*self.a.time_to_turn(turn_angle_a),
-                         self.b.initial_position[1] + self.b.airspeed*np.cos(self.b.initial_heading)*self.a.time_to_turn(turn_angle_a)])
+                angle = None
+            if angle is not None:
+                resolution_type = '2a'
             else:
-                p_b1 = self.b.turn_position(self.b.time_to_turn(turn_angle_b))
-
-        dx1 = p_b1[0] - p_a1[0]
-        dy1 = p_b1[1] - p_a1[1]
-        heading_a = turn_angle_a
-        heading_b = turn_angle_b + self.b.initial_heading
-        Vrx = self.b.airspeed*np.sin(heading_b) - self.a.airspeed*np.sin(heading_a)
-        Vry = self.b.airspeed*np.cos(heading_b) - self.a.airspeed*np.cos(heading_a)
-        d_smin = np.sqrt( (dx1 - Vrx*(dx1*Vrx + dy1*Vry)/(Vrx**2 + Vry**2))**2 
-                        + (dy1 - Vry*(dx1*Vrx + dy1*Vry)/(Vrx**2 + Vry**2))**2 )
-        return d_smin
+                resolution_type = '2b'
+                angle = find_max_2()
+                if angle is None:
+                    return None
+            resolution_angle = turn(angle)[0]
+
+        if warm is not None and resolution_type != warm['resolution_type']:
+            return None
+        return {'resolution_type': resolution_type,
+                'resolution_angle': float(resolution_angle),
+                'resolution_time': float(resolution_time),
+                'min_separation': float(min_separation),
+                'd_tmin': float(d_tmin),
+                'turn_angle_min': float(turn_angle_min),
+                'turn_time_min': float(turn_time_min),
+                'evaluations': evaluations,
+                'sweep_min': float(sweep_min),
+                'sweep_max': None if sweep_max is None else float(sweep_max),
+                'sweep_crossing': None if sweep_crossing is None else float(sweep_crossing),
+                'sweep_resolution': float(angle)}
 
     #### Table data and plot for each maneuver type ####
 
-    def A_turns_B_straight(self, bank_angle):
+    def A_turns_B_straight(self, bank_angle, plot=True, verbose=True, curves=False):
+    # Returns the Resolution records of the right and left turns, printing the table data unless verbose is False
+    # and plotting unless plot is False
+        records = []
         for i in range(2):
             if i == 0:
                 direction = 'right'
@@ -178,46 +934,32 @@ class ManeuverData:
             self.a.bank_angle_(np.deg2rad(bank_angle))
 
             # Find minimum turn separation, corresponding time, and turn angle
-            separation = []
-            for turn_angle in turn_angles:
-                separation.append(self.get_da(self.a.time_to_turn(turn_angle)))
-            index = separation.index(min(separation))
-            d_tmin = separation[index]
-            turn_angle_min = turn_angles[index]
-            turn_time_min = self.a.time_to_turn(turn_angle_min)
-
-            # Find time to minimum separation in straight line followed by minimum separation
-            t_smin = []
-            separation_straight = []
-            for j, turn_angle in enumerate(turn_angles):
-                t_smin.append(self.get_t_smin(turn_angle,0))
-                separation_straight.append(self.get_d_smin(turn_angle, 0))
-                # Plots meet at min turn separation
-                if  j > index: 
-                    separation_straight[-1] = separation[j] 
+            turn_angles_b = np.zeros_like(turn_angles)
+            separation, t_smin, separation_straight = self.get_sweep_data(turn_angles, turn_angles_b)
+            index = np.argmin(separation)
+            turn_times = self.a.time_to_turn(turn_angles)
+            turn_separation = self.turn_separation(self.a.bank_angle, 0)
+            d_tmin, turn_time_min = map(float, turn_minimum(turn_separation, turn_times, index))
+            turn_angle_min = self.a.turn_angle_(turn_time_min)
+
+            # Plots of minimum separation in straight line meet turn separation at min turn separation
+            separation_straight[index+1:] = separation[index+1:]
 
             # Find time to get to min separation overall w/ specified turn angle
-            turn_times = []
-            for turn_angle in turn_angles:
-                turn_times.append(self.a.time_to_turn(turn_angle))
-            resolution_times = []
-            for [j, turn_time] in enumerate(turn_times):
-                if t_smin[j] >= 0:
-                    resolution_times.append(turn_time + t_smin[j])
-                else:
-                    resolution_times.append(turn_time)
+            resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
 
             #### FIND RESOLUTION DATA ####
 
             # Check for any maxima prior to locus merge
-            maximum = signal.argrelmax(np.array(separation_straight)) # Check if there is a local max
-            maximum = maximum[0] # Isolate the index of the max
+            maximum = np.flatnonzero(local_maxima(separation_straight)) # Indices of any local max
             
-            # Try for type 1 resolution
-            if d_tmin >= self.d_req or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req):
+            # Try for type 1 resolution, which needs an angle whose straight separation is above d_req
+            candidates = np.flatnonzero(separation_straight > self.d_req)
+            if candidates.size > 0 and (d_tmin >= self.d_req
+                                        or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req)):
                 resolution_type = '1'
-                min_separation = min(i for i in separation_straight if i > self.d_req)
-                resolution_index = separation_straight.index(min_separation)
+                resolution_index = candidates[np.argmin(separation_straight[candidates])]
+                min_separation = separation_straight[resolution_index]
                 resolution_angle = turn_angles[resolution_index]
                 resolution_time = resolution_times[resolution_index]
                 # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a solution
@@ -230,25 +972,42 @@ class ManeuverData:
                     else: resolution_type = '2'
             else: resolution_type = '2'
 
-            # Find best parameters for type 2 resolutions.
-
+            # Give best resolution parameters to type 2 solutions
+            if resolution_type == '2':
+                min_separation = d_tmin
+                resolution_time = turn_time_min
+                candidates = index + np.flatnonzero(separation[index:] > self.d_req)
+                if candidates.size > 0:
+                    resolution_type = '2a'
+                    resolution_index = candidates[np.argmin(separation[candidates])]
+                    resolution_angle = turn_angles[resolution_index]
+                else:
+                    resolution_type = '2b'
+                    resolution_index = index + np.argmax(separation[index:])
+                    resolution_angle = turn_angles[resolution_index]
 
+            # Keep the resolution as a record, with the curves on request
+            curve_data = (turn_angles, separation, separation_straight, resolution_times) if curves else ()
+            label = 'A {} B straight ({})'.format(direction, abs(bank_angle))
+            records.append(Resolution(label, resolution_type, min_separation, resolution_angle,
+                                      resolution_time, d_tmin, turn_angle_min, turn_time_min, *curve_data))
 
             # Print table data
-            print('A {} B straight'.format(direction))
-
-            # Print turn data
-            # print('\tMinimum Separation in Turn:')
-            # print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
-            # print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
-            # print('\t\tTime (min):', round(turn_time_min/60, 2))
-
-            # Print resolution data
-            print('\tResolution Parameters:')
-            print('\t\tResolution Type', resolution_type)
-            print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
-            print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
-            print('\t\tResolution Time (min):', round(resolution_time/60, 2))
+            if verbose:
+                print('A {} B straight'.format(direction))
+
+                # Print turn data
+                # print('\tMinimum Separation in Turn:')
+                # print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
+                # print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
+                # print('\t\tTime (min):', round(turn_time_min/60, 2))
+
+                # Print resolution data
+                print('\tResolution Parameters:')
+                print('\t\tResolution Type', resolution_type)
+                print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
+                print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
+                print('\t\tResolution Time (min):', round(resolution_time/60, 2))
 
              # Prep plot data
             if i == 0:
@@ -262,20 +1021,18 @@ class ManeuverData:
 
 
         # Plot maneuver data
-        separation = np.array(separation_left + separation_right[1::]) / 1852
-        separation_straight = np.array(separation_straight_left + separation_straight_right[1::]) / 1852
-        resolution_times = np.array(resolution_times_left + resolution_times_right[1::])
+        separation = np.concatenate((separation_left, separation_right[1::])) / 1852
+        separation_straight = np.concatenate((separation_straight_left, separation_straight_right[1::])) / 1852
+        resolution_times = np.concatenate((resolution_times_left, resolution_times_right[1::]))
         turn_angles = np.arange(-148,150,2)
-        plt.plot(turn_angles, separation)
-        plt.plot(turn_angles, separation_straight)
-        plt.plot(turn_angles, np.array(resolution_times)/60)
-        plt.title('A turns B straight')
-        plt.ylabel('Separation (nm)')
-        plt.xlabel('Turn Angle (deg)')
-        plt.grid()
-        plt.show()
-
-    def A_straight_B_turns(self, bank_angle):
+        if plot:
+            plot_separation(turn_angles, separation, separation_straight, resolution_times, 'A turns B straight')
+        return records
+
+    def A_straight_B_turns(self, bank_angle, plot=True, verbose=True, curves=False):
+    # Returns the Resolution records of the right and left turns, printing the table data unless verbose is False
+    # and plotting unless plot is False
+        records = []
         for i in range(2):
             if i == 0:
                 direction = 'right'
@@ -288,46 +1045,32 @@ class ManeuverData:
             self.b.bank_angle_(np.deg2rad(bank_angle))
 
             # Find minimum turn separation, corresponding time and turn angle
-            separation = []
-            for turn_angle in turn_angles:
-                separation.append(self.get_db(self.b.time_to_turn(turn_angle)))
-            index = separation.index(min(separation))
-            d_tmin = separation[index]
-            turn_angle_min = turn_angles[index]
-            turn_time_min = self.b.time_to_turn(turn_angle_min)
-
-            # Find time to minimum separation in straight line followed by minimum separation
-            t_smin = []
-            separation_straight = []
-            for j, turn_angle in enumerate(turn_angles):
-                t_smin.append(self.get_t_smin(0, turn_angle))
-                separation_straight.append(self.get_d_smin(0, turn_angle))
-                # Plots meet at min turn separation
-                if  j > index: 
-                    separation_straight[-1] = separation[j]
+            turn_angles_a = np.zeros_like(turn_angles)
+            separation, t_smin, separation_straight = self.get_sweep_data(turn_angles_a, turn_angles)
+            index = np.argmin(separation)
+            turn_times = self.b.time_to_turn(turn_angles)
+            turn_separation = self.turn_separation(0, self.b.bank_angle)
+            d_tmin, turn_time_min = map(float, turn_minimum(turn_separation, turn_times, index))
+            turn_angle_min = self.b.turn_angle_(turn_time_min)
+
+            # Plots of minimum separation in straight line meet turn separation at min turn separation
+            separation_straight[index+1:] = separation[index+1:]
 
             # Find time to get to min separation w/ specified turn angle
-            turn_times = []
-            for turn_angle in turn_angles:
-                turn_times.append(self.b.time_to_turn(turn_angle))
-            resolution_times = []
-            for [j, turn_time] in enumerate(turn_times):
-                if t_smin[j] >= 0:
-                    resolution_times.append(turn_time + t_smin[j])
-                else:
-                    resolution_times.append(turn_time)
+            resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
 
            #### FIND RESOLUTION DATA ####
 
             # Check for any maxima prior to locus merge
-            maximum = signal.argrelmax(np.array(separation_straight)) # Check if there is a local max
-            maximum = maximum[0] # Isolate the index of the max
+            maximum = np.flatnonzero(local_maxima(separation_straight)) # Indices of any local max
             
-            # Try for type 1 resolution
-            if d_tmin >= self.d_req or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req):
+            # Try for type 1 resolution, which needs an angle whose straight separation is above d_req
+            candidates = np.flatnonzero(separation_straight > self.d_req)
+            if candidates.size > 0 and (d_tmin >= self.d_req
+                                        or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req)):
                 resolution_type = '1'
-                min_separation = min(i for i in separation_straight if i > self.d_req)
-                resolution_index = separation_straight.index(min_separation)
+                resolution_index = candidates[np.argmin(separation_straight[candidates])]
+                min_separation = separation_straight[resolution_index]
                 resolution_angle = turn_angles[resolution_index]
                 resolution_time = resolution_times[resolution_index]
                 # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a solution
@@ -344,33 +1087,36 @@ class ManeuverData:
             if resolution_type == '2':
                 min_separation = d_tmin
                 resolution_time = turn_time_min
-                try:
-                    req_sep = min(i for i in separation[index:] if i > self.d_req)
-                    resolution_index = separation.index(req_sep)
-                except ValueError:
-                    req_sep = np.array([])
-                if req_sep.size > 0:
+                candidates = index + np.flatnonzero(separation[index:] > self.d_req)
+                if candidates.size > 0:
                     resolution_type = '2a'
+                    resolution_index = candidates[np.argmin(separation[candidates])]
                     resolution_angle = turn_angles[resolution_index]
                 else:
                     resolution_type = '2b'
-                    max_turn_separation = max(separation[index:])
-                    resolution_index = separation.index(max_turn_separation)
+                    resolution_index = index + np.argmax(separation[index:])
                     resolution_angle = turn_angles[resolution_index]
             
+            # Keep the resolution as a record, with the curves on request
+            curve_data = (turn_angles, separation, separation_straight, resolution_times) if curves else ()
+            label = 'A straight B {} ({})'.format(direction, abs(bank_angle))
+            records.append(Resolution(label, resolution_type, min_separation, resolution_angle,
+                                      resolution_time, d_tmin, turn_angle_min, turn_time_min, *curve_data))
+
             # Print table data
-            print('A straight B {}'.format(direction))
-            # Turn Data
-            print('\tMinimum Separation in Turn:')
-            print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
-            print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
-            print('\t\tTime to min separation (min):', round(turn_time_min/60, 2))
-            # Resolution Data
-            print('\tResolution Parameters:')
-            print('\t\tResolution Type', resolution_type)
-            print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
-            print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
-            print('\t\tTime to min separation (min):', round(resolution_time/60, 2))
+            if verbose:
+                print('A straight B {}'.format(direction))
+                # Turn Data
+                print('\tMinimum Separation in Turn:')
+                print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
+                print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
+                print('\t\tTime to min separation (min):', round(turn_time_min/60, 2))
+                # Resolution Data
+                print('\tResolution Parameters:')
+                print('\t\tResolution Type', resolution_type)
+                print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
+                print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
+                print('\t\tTime to min separation (min):', round(resolution_time/60, 2))
 
             # Prep plot data
             if i == 0:
@@ -383,20 +1129,18 @@ class ManeuverData:
                 resolution_times_left = resolution_times[::-1]
 
         # Plot maneuver data
-        separation = np.array(separation_left + separation_right[1::]) / 1852
-        separation_straight = np.array(separation_straight_left + separation_straight_right[1::]) / 1852
-        resolution_times = np.array(resolution_times_left + resolution_times_right[1::])
+        separation = np.concatenate((separation_left, separation_right[1::])) / 1852
+        separation_straight = np.concatenate((separation_straight_left, separation_straight_right[1::])) / 1852
+        resolution_times = np.concatenate((resolution_times_left, resolution_times_right[1::]))
         turn_angles = np.arange(-148,150,2)
-        plt.plot(turn_angles, separation)
-        plt.plot(turn_angles, separation_straight)
-        plt.plot(turn_angles, np.array(resolution_times)/60)
-        plt.title('A straight B turns')
-        plt.ylabel('Separation (nm)')
-        plt.xlabel('Turn Angle (deg)')
-        plt.grid()
-        plt.show()        
-
-    def A_turns_B_right(self):
+        if plot:
+            plot_separation(turn_angles, separation, separation_straight, resolution_times, 'A straight B turns')
+        return records
+
+    def A_turns_B_right(self, plot=True, verbose=True, curves=False):
+    # Returns the Resolution records of the right and left turns, printing the table data unless verbose is False
+    # and plotting unless plot is False
+        records = []
         bank_angle = 30
         self.b.bank_angle_(np.deg2rad(bank_angle))
 
@@ -412,46 +1156,32 @@ class ManeuverData:
             self.a.bank_angle_(np.deg2rad(bank_angle))
 
             # Find minimum turn separation, corresponding time and turn angle
-            separation = []
-            for turn_angle in turn_angles:
-                separation.append(self.get_dab(self.a.time_to_turn(turn_angle)))
-            index = separation.index(min(separation))
-            d_tmin = separation[index]
-            turn_angle_min = turn_angles[index]
-            turn_time_min = self.a.time_to_turn(turn_angle_min)
+            turn_angles_b = self.b.turn_angle_(self.a.time_to_turn(turn_angles))
+            separation, t_smin, separation_straight = self.get_sweep_data(turn_angles, turn_angles_b)
+            index = np.argmin(separation)
+            turn_times = self.a.time_to_turn(turn_angles)
+            turn_separation = self.turn_separation(self.a.bank_angle, self.b.bank_angle)
+            d_tmin, turn_time_min = map(float, turn_minimum(turn_separation, turn_times, index))
+            turn_angle_min = self.a.turn_angle_(turn_time_min)
             
-           # Find time to minimum separation in straight line, followed by minimum separation
-            t_smin = []
-            separation_straight = []
-            for j, turn_angle in enumerate(turn_angles):
-                t_smin.append(self.get_t_smin(turn_angle, self.b.turn_angle_(self.a.time_to_turn(turn_angle))))
-                separation_straight.append(self.get_d_smin(turn_angle, self.b.turn_angle_(self.a.time_to_turn(turn_angle))))
-                # Plots meet at min turn separation
-                if  j > index: 
-                    separation_straight[-1] = separation[j]
+            # Plots of minimum separation in straight line meet turn separation at min turn separation
+            separation_straight[index+1:] = separation[index+1:]
 
             # Find time to get to min separation overall w/ specified turn angle
-            turn_times = []
-            for turn_angle in turn_angles:
-                turn_times.append(self.a.time_to_turn(turn_angle))
-            resolution_times = []
-            for [j, turn_time] in enumerate(turn_times):
-                if t_smin[j] >= 0:
-                    resolution_times.append(turn_time + t_smin[j])
-                else:
-                    resolution_times.append(turn_time)
+            resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
 
             #### FIND RESOLUTION DATA ####
 
             # Check for any maxima prior to locus merge
-            maximum = signal.argrelmax(np.array(separation_straight)) # Check if there is a local max
-            maximum = maximum[0] # Isolate the index of the max
+            maximum = np.flatnonzero(local_maxima(separation_straight)) # Indices of any local max
             
-            # Try for type 1 resolution
-            if d_tmin >= self.d_req or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req):
+            # Try for type 1 resolution, which needs an angle whose straight separation is above d_req
+            candidates = np.flatnonzero(separation_straight > self.d_req)
+            if candidates.size > 0 and (d_tmin >= self.d_req
+                                        or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req)):
                 resolution_type = '1'
-                min_separation = min(i for i in separation_straight if i > self.d_req)
-                resolution_index = separation_straight.index(min_separation)
+                resolution_index = candidates[np.argmin(separation_straight[candidates])]
+                min_separation = separation_straight[resolution_index]
                 resolution_angle = turn_angles[resolution_index]
                 resolution_time = resolution_times[resolution_index]
                 # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a solution
@@ -468,33 +1198,36 @@ class ManeuverData:
             if resolution_type == '2':
                 min_separation = d_tmin
                 resolution_time = turn_time_min
-                try:
-                    req_sep = min(i for i in separation[index:] if i > self.d_req)
-                    resolution_index = separation.index(req_sep)
-                except ValueError:
-                    req_sep = np.array([])
-                if req_sep.size > 0:
+                candidates = index + np.flatnonzero(separation[index:] > self.d_req)
+                if candidates.size > 0:
                     resolution_type = '2a'
+                    resolution_index = candidates[np.argmin(separation[candidates])]
                     resolution_angle = turn_angles[resolution_index]
                 else:
                     resolution_type = '2b'
-                    max_turn_separation = max(separation[index:])
-                    resolution_index = separation.index(max_turn_separation)
+                    resolution_index = index + np.argmax(separation[index:])
                     resolution_angle = turn_angles[resolution_index]
 
+            # Keep the resolution as a record, with the curves on request
+            curve_data = (turn_angles, separation, separation_straight, resolution_times) if curves else ()
+            label = 'A {} B right'.format(direction)
+            records.append(Resolution(label, resolution_type, min_separation, resolution_angle,
+                                      resolution_time, d_tmin, turn_angle_min, turn_time_min, *curve_data))
+
             # Print table data
-            print('A {} B right'.format(direction))
-            # Print turn data
-            print('\tMinimum Separation in Turn:')
-            print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
-            print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
-            print('\t\tTime (min):', round(turn_time_min/60, 2))
-            # Prtint resolution data
-            print('\tResolution Parameters:')
-            print('\t\tResolution Type', resolution_type)
-            print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
-            print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
-            print('\t\tTime (min):', round(resolution_time/60, 2))
+            if verbose:
+                print('A {} B right'.format(direction))
+                # Print turn data
+                print('\tMinimum Separation in Turn:')
+                print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
+                print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
+                print('\t\tTime (min):', round(turn_time_min/60, 2))
+                # Prtint resolution data
+                print('\tResolution Parameters:')
+                print('\t\tResolution Type', resolution_type)
+                print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
+                print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
+                print('\t\tTime (min):', round(resolution_time/60, 2))
 
             # Prep plot data
             if i == 0:
@@ -507,20 +1240,18 @@ class ManeuverData:
                 resolution_times_left = resolution_times[::-1]
 
         # Plot maneuver data
-        separation = np.array(separation_left + separation_right[1::]) / 1852
-        separation_straight = np.array(separation_straight_left + separation_straight_right[1::]) / 1852
-        resolution_times = np.array(resolution_times_left + resolution_times_right[1::])
+        separation = np.concatenate((separation_left, separation_right[1::])) / 1852
+        separation_straight = np.concatenate((separation_straight_left, separation_straight_right[1::])) / 1852
+        resolution_times = np.concatenate((resolution_times_left, resolution_times_right[1::]))
         turn_angles = np.arange(-148,150,2)
-        plt.plot(turn_angles, separation)
-        plt.plot(turn_angles, separation_straight)
-        plt.plot(turn_angles, np.array(resolution_times)/60)
-        plt.title('A turns B right')
-        plt.ylabel('Separation (nm)')
-        plt.xlabel('Turn Angle (deg)')
-        plt.grid()
-        plt.show() 
-
-    def A_turns_B_left(self):
+        if plot:
+            plot_separation(turn_angles, separation, separation_straight, resolution_times, 'A turns B right')
+        return records
+
+    def A_turns_B_left(self, plot=True, verbose=True, curves=False):
+    # Returns the Resolution records of the right and left turns, printing the table data unless verbose is False
+    # and plotting unless plot is False
+        records = []
         bank_angle = 30
         self.b.bank_angle_(np.deg2rad(-bank_angle))
 
@@ -536,46 +1267,32 @@ class ManeuverData:
             self.a.bank_angle_(np.deg2rad(bank_angle))
 
             # Find minimum turn separation, corresponding time and turn angle
-            separation = []
-            for turn_angle in turn_angles:
-                separation.append(self.get_dab(self.a.time_to_turn(turn_angle)))
-            index = separation.index(min(separation))
-            d_tmin = separation[index]
-            turn_angle_min = turn_angles[index]
-            turn_time_min = self.a.time_to_turn(turn_angle_min)
+            turn_angles_b = self.b.turn_angle_(self.a.time_to_turn(turn_angles))
+            separation, t_smin, separation_straight = self.get_sweep_data(turn_angles, turn_angles_b)
+            index = np.argmin(separation)
+            turn_times = self.a.time_to_turn(turn_angles)
+            turn_separation = self.turn_separation(self.a.bank_angle, self.b.bank_angle)
+            d_tmin, turn_time_min = map(float, turn_minimum(turn_separation, turn_times, index))
+            turn_angle_min = self.a.turn_angle_(turn_time_min)
             
-            # Find time to minimum separation in straight line followed by minimum separation
-            t_smin = []
-            separation_straight = []
-            for j, turn_angle in enumerate(turn_angles):
-                t_smin.append(self.get_t_smin(turn_angle, self.b.turn_angle_(self.a.time_to_turn(turn_angle))))
-                separation_straight.append(self.get_d_smin(turn_angle, self.b.turn_angle_(self.a.time_to_turn(turn_angle))))
-                # Plots meet at min turn separation
-                if  j > index: 
-                    separation_straight[-1] = separation[j]
+            # Plots of minimum separation in straight line meet turn separation at min turn separation
+            separation_straight[index+1:] = separation[index+1:]
 
             # Find time to get to min separation overall w/ specified turn angle
-            turn_times = []
-            for turn_angle in turn_angles:
-                turn_times.append(self.a.time_to_turn(turn_angle))
-            resolution_times = []
-            for [j, turn_time] in enumerate(turn_times):
-                if t_smin[j] >= 0:
-                    resolution_times.append(turn_time + t_smin[j])
-                else:
-                    resolution_times.append(turn_time)
+            resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
 
             #### FIND RESOLUTION DATA ####
 
             # Check for any maxima prior to locus merge
-            maximum = signal.argrelmax(np.array(separation_straight)) # Check if there is a local max
-            maximum = maximum[0] # Isolate the index of the max
+            maximum = np.flatnonzero(local_maxima(separation_straight)) # Indices of any local max
             
-            # Try for type 1 resolution
-            if d_tmin >= self.d_req or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req):
+            # Try for type 1 resolution, which needs an angle whose straight separation is above d_req
+            candidates = np.flatnonzero(separation_straight > self.d_req)
+            if candidates.size > 0 and (d_tmin >= self.d_req
+                                        or (maximum.size > 0 and separation_straight[maximum[0]] >= self.d_req)):
                 resolution_type = '1'
-                min_separation = min(i for i in separation_straight if i > self.d_req)
-                resolution_index = separation_straight.index(min_separation)
+                resolution_index = candidates[np.argmin(separation_straight[candidates])]
+                min_separation = separation_straight[resolution_index]
                 resolution_angle = turn_angles[resolution_index]
                 resolution_time = resolution_times[resolution_index]
                 # Check resolution time constraint or if resolution is in unstable region. If violated, switch to 1a solution
@@ -592,33 +1309,36 @@ class ManeuverData:
             if resolution_type == '2':
                 min_separation = d_tmin
                 resolution_time = turn_time_min
-                try:
-                    req_sep = min(i for i in separation[index:] if i > self.d_req)
-                    resolution_index = separation.index(req_sep)
-                except ValueError:
-                    req_sep = np.array([])
-                if req_sep.size > 0:
+                candidates = index + np.flatnonzero(separation[index:] > self.d_req)
+                if candidates.size > 0:
                     resolution_type = '2a'
+                    resolution_index = candidates[np.argmin(separation[candidates])]
                     resolution_angle = turn_angles[resolution_index]
                 else:
                     resolution_type = '2b'
-                    max_turn_separation = max(separation[index:])
-                    resolution_index = separation.index(max_turn_separation)
+                    resolution_index = index + np.argmax(separation[index:])
                     resolution_angle = turn_angles[resolution_index]
 
+            # Keep the resolution as a record, with the curves on request
+            curve_data = (turn_angles, separation, separation_straight, resolution_times) if curves else ()
+            label = 'A {} B left'.format(direction)
+            records.append(Resolution(label, resolution_type, min_separation, resolution_angle,
+                                      resolution_time, d_tmin, turn_angle_min, turn_time_min, *curve_data))
+
             # Print table data
-            print('A {} B left'.format(direction))
-            # Print turn data
-            print('\tMinimum Separation in Turn:')
-            print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
-            print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
-            print('\t\tTime (min):', round(turn_time_min/60, 2))
-            # Prtint resolution data
-            print('\tResolution Parameters:')
-            print('\t\tResolution Type', resolution_type)
-            print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
-            print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
-            print('\t\tTime (min):', round(resolution_time/60, 2))
+            if verbose:
+                print('A {} B left'.format(direction))
+                # Print turn data
+                print('\tMinimum Separation in Turn:')
+                print('\t\tMinimum Separation (nmi):', round(d_tmin/1852, 2))
+                print('\t\tTurn Angle (deg)', round(np.rad2deg(turn_angle_min), 2))
+                print('\t\tTime (min):', round(turn_time_min/60, 2))
+                # Prtint resolution data
+                print('\tResolution Parameters:')
+                print('\t\tResolution Type', resolution_type)
+                print('\t\tMinimum Separation (nmi):', round(min_separation/1852, 2))
+                print('\t\tResolution Angle (deg)', round(np.rad2deg(resolution_angle), 2))
+                print('\t\tTime (min):', round(resolution_time/60, 2))
 
             # Prep plot data
             if i == 0:
@@ -631,18 +1351,34 @@ class ManeuverData:
                 resolution_times_left = resolution_times[::-1]
 
         # Plot maneuver data
-        separation = np.array(separation_left + separation_right[1::]) / 1852
-        separation_straight = np.array(separation_straight_left + separation_straight_right[1::]) / 1852
-        resolution_times = np.array(resolution_times_left + resolution_times_right[1::])
+        separation = np.concatenate((separation_left, separation_right[1::])) / 1852
+        separation_straight = np.concatenate((separation_straight_left, separation_straight_right[1::])) / 1852
+        resolution_times = np.concatenate((resolution_times_left, resolution_times_right[1::]))
         turn_angles = np.arange(-148,150,2)
-        plt.plot(turn_angles, separation)
-        plt.plot(turn_angles, separation_straight)
-        plt.plot(turn_angles, np.array(resolution_times)/60)
-        plt.title('A turns B left')
-        plt.ylabel('Separation (nm)')
-        plt.xlabel('Turn Angle (deg)')
-        plt.grid()
-        plt.show() 
+        if plot:
+            plot_separation(turn_angles, separation, separation_straight, resolution_times, 'A turns B left')
+        return records
+
+#### Refinement cost ####
+
+refine_seed = None # slowest refinement of the reference encounter in this process [s], see warm_refinement
+
+def warm_refinement():
+# Imports SciPy and times solve_maneuver for the 12 maneuvers of the reference encounter of erz_2010_test_case_2_,
+# once per process. Returns the slowest refinement, which seeds the refinement time of resolve_anytime without
+# the import
+    global refine_seed
+    if refine_seed is None:
+        from scipy import optimize
+        data = ManeuverData(MainAircraft(400*0.514), ConflictingCraft(480*0.514, np.array([4, 5.83])*1852,
+                                                                      np.deg2rad(270)))
+        durations = []
+        for _, bank_a, bank_b in maneuvers:
+            start = time.perf_counter()
+            data.solve_maneuver(bank_a, bank_b)
+            durations.append(time.perf_counter() - start)
+        refine_seed = max(durations)
+    return refine_seed
 
 def erz_2010_test_case_():
 
@@ -682,6 +1418,9 @@ def erz_2010_test_case_():
     # Testing for A turns B left expedited maneuver
     # data.A_turns_B_left() #(TURN DATA WORKING) (Note: A right slightly innacurate)
 
+    # Ranked resolutions for all 12 maneuvers
+    # data.resolve_all()
+
 def erz_2010_test_case_2_():
 
     # Create reference aircraft with set velocity
@@ -720,5 +1459,13 @@ def erz_2010_test_case_2_():
     # Testing for A turns B left expedited maneuver
     # data.A_turns_B_left() #(TURN DATA WORKING) (Note: A right slightly innacurate)
 
-# erz_2010_test_case_()
-erz_2010_test_case_2_()
+    # Ranked resolutions for all 12 maneuvers
+    # data.resolve_all()
+
+    # Best resolution within a 5 ms budget, with SciPy imported and the refinement timed beforehand
+    # warm_refinement()
+    # data.resolve_anytime(0.005)
+
+if __name__ == '__main__':
+    # erz_2010_test_case_()
+    erz_2010_test_case_2_()
@@ -0,0 +1,77 @@
+''' BlueSky plugin issuing Erzberger & Heere (2010) resolution advisories without stalling the simulation.
+
+Every update the traffic is screened for conflicts (ConflictDetection) and the conflicting pairs are submitted
+to an AsyncResolver. Advisories arrive on later updates, as soon as a worker has resolved them, and are echoed
+to the console. Copy this file and the modules it imports to the BlueSky plugins directory and enable it with
+PLUGINS LOAD ERZ2010, then ERZ2010 ON.
+'''
+
+import numpy as np
+
+from bluesky import stack, traf
+
+from AsyncResolution import AsyncResolver
+from ConflictDetection import detect, pair_encounters
+from Projection import reference, flat_earth
+
+
+resolver = None
+
+
+def init_plugin():
+    config = {
+        'plugin_name': 'ERZ2010',
+        'plugin_type': 'sim',
+        'update_interval': 1.0,
+        'update': update,
+        'reset': reset,
+    }
+    stackfunctions = {
+        'ERZ2010': [
+            'ERZ2010 ON/OFF',
+            '[onoff]',
+            enable,
+            'Asynchronous Erzberger & Heere (2010) resolution advisories',
+        ],
+    }
+    return config, stackfunctions
+
+
+def enable(flag=True):
+    ''' Starts or stops the worker pool. '''
+    global resolver
+    if flag and resolver is None:
+        resolver = AsyncResolver()
+    elif not flag and resolver is not None:
+        resolver.shutdown(wait=False)
+        resolver = None
+    return True, 'ERZ2010 is ' + ('ON' if flag else 'OFF')
+
+
+def reset():
+    if resolver is not None:
+        enable(False)
+
+
+def update():
+    ''' Submits the current conflicts and echoes the advisories that arrived since the last update. '''
+    if resolver is None or traf.ntraf < 2:
+        return
+    lat0, lon0 = reference(traf.lat, traf.lon)
+    x, y = flat_earth(traf.lat, traf.lon, lat0, lon0)
+    positions = np.column_stack((x, y))
+    headings = np.deg2rad(traf.hdg)
+    airspeeds = np.asarray(traf.tas, dtype=float)
+
+    pairs, _ = detect(positions, headings, airspeeds)
+    ids = np.array(traf.id)
+    keys = list(zip(ids[pairs[:, 0]], ids[pairs[:, 1]]))
+    resolver.forget(set(resolver.latest) - set(keys))
+    if keys:
+        resolver.submit(keys, pair_encounters(positions, headings, airspeeds, pairs))
+
+    for id_a, id_b in resolver.poll():
+        advisory = resolver.advisories[(id_a, id_b)]
+        stack.stack('ECHO ERZ2010 {} / {}: {}, type {}, turn {:.0f} deg'.format(
+            id_a, id_b, advisory['maneuver'], advisory['resolution_type'],
+            np.rad2deg(advisory['resolution_angle'])))
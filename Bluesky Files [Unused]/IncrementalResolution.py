@@ -0,0 +1,65 @@
+''' Incremental re-resolution of ongoing encounters across simulation ticks.
+
+From one tick to the next the geometry of an encounter changes only a little, and so do the features its
+resolution is derived from (the turn minimum, the first maximum of d_smin and the d_req crossing). The
+IncrementalResolver keeps the last solution of every pair and re-solves its maneuver warm-started from those
+features (ManeuverData.solve_maneuver with warm), in brackets sized by how far the resolution moved on the
+previous tick. A full search over all maneuvers is run for new pairs, when a feature cannot be tracked or the
+resolution type changes, and every `refresh` ticks to bound drift. Pairs without a successful resolution (types 2a
+and 2b) are searched in full on every tick, since a resolution may appear anywhere in the sweep.
+'''
+
+import numpy as np
+
+from Erz2010new import maneuvers, MainAircraft, ConflictingCraft, ManeuverData
+from BatchResolution import d_req, turn_angle_grid
+
+
+bank_angles = {label: (bank_a, bank_b) for label, bank_a, bank_b in maneuvers}
+
+
+class IncrementalResolver:
+    ''' Warm-started resolution per aircraft pair. '''
+
+    def __init__(self, refresh=30, window=np.deg2rad(0.5), turn_angles=turn_angle_grid, d_req=d_req):
+        self.refresh = refresh # ticks between full searches
+        self.window = window # smallest tracking bracket half-width [rad]
+        self.turn_angles = turn_angles # turn angle grid of full searches [rad]
+        self.d_req = d_req
+        self.states = dict() # pair -> maneuver, last solution, its change since the tick before and tick count
+        self.full = 0 # full searches
+        self.warm = 0 # warm-started solves
+        self.evaluations = 0 # kernel evaluations of all solves
+
+    def resolve(self, pair, encounter):
+        ''' Resolution of a pair for its current encounter, a dictionary of scalars with the keys of
+        BatchResolution.make_encounters. Returns the solve_maneuver dictionary with the maneuver label. '''
+        data = ManeuverData(MainAircraft(encounter['airspeed_a']),
+                            ConflictingCraft(encounter['airspeed_b'], (encounter['x_b'], encounter['y_b']),
+                                             encounter['heading_b']))
+        data.d_req = self.d_req
+        state = self.states.get(pair)
+
+        solution = None
+        resolved = state is not None and state['solution']['resolution_type'] in ('1', '1a')
+        if resolved and state['ticks'] < self.refresh:
+            window = max(self.window, 2*state['shift'])
+            solution = data.solve_maneuver(*bank_angles[state['maneuver']], warm=state['solution'], window=window)
+            if solution is not None:
+                self.warm += 1
+                self.evaluations += solution['evaluations']
+                shift = abs(solution['sweep_resolution'] - state['solution']['sweep_resolution'])
+                state.update(solution=solution, shift=shift, ticks=state['ticks'] + 1)
+
+        if solution is None:
+            maneuver = data.resolve_all(self.turn_angles)[0]['maneuver']
+            solution = data.solve_maneuver(*bank_angles[maneuver])
+            self.full += 1
+            self.evaluations += len(maneuvers)*np.size(self.turn_angles) + solution['evaluations']
+            state = self.states[pair] = {'maneuver': maneuver, 'solution': solution, 'shift': 0, 'ticks': 0}
+        return dict(solution, maneuver=state['maneuver'])
+
+    def forget(self, pairs):
+        ''' Discards the state of pairs that are no longer in conflict. '''
+        for pair in pairs:
+            self.states.pop(pair, None)
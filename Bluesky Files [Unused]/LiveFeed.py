@@ -0,0 +1,98 @@
+''' Live conflict feed from a BlueSky log that is still being written.
+
+The log is tailed with DataHandler.follow_log, so only appended rows are parsed. The feed keeps a rolling window
+of the most recent states of every aircraft and, each time new rows arrive, detects and resolves the conflicts of
+the timesteps that have been completed since the previous tick (Replay.resolve_steps). A timestep is complete once
+rows of a later timestep have been logged. At most max_steps timesteps are resolved per tick; when the feed falls
+further behind, the oldest pending timesteps are skipped (and counted in skipped) so the work per tick stays
+bounded. Timesteps that have not been resolved or skipped are kept even when they are older than the window, so a
+chunk spanning more than the window is resolved in full.
+'''
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Bluesky Test Logs'))
+
+from DataHandler import follow_log
+from ConflictDetection import look_ahead, d_req
+from Projection import reference, project_columns
+from Replay import timesteps, resolve_steps
+
+
+class ConflictFeed:
+    ''' Rolling per-aircraft state window with incremental conflict detection and resolution. '''
+
+    def __init__(self, lat0=None, lon0=None, window=60, max_steps=10, look_ahead=look_ahead, d_req=d_req):
+        self.lat0, self.lon0 = lat0, lon0 # local frame reference, the first rows' mean position if None
+        self.window = window # seconds of states kept per aircraft
+        self.max_steps = max_steps # timesteps resolved per tick
+        self.look_ahead = look_ahead
+        self.d_req = d_req
+        self.columns = None
+        self.resolved = -np.inf # time of the last resolved timestep
+        self.skipped = 0 # timesteps dropped to keep up
+
+    def append(self, chunk):
+        ''' Adds newly logged rows to the window and drops the states older than the window, except those of
+        timesteps that have not been resolved yet. '''
+        if self.columns is None:
+            self.columns = {label: np.asarray(column) for label, column in chunk.items()}
+            if self.lat0 is None or self.lon0 is None:
+                self.lat0, self.lon0 = reference(chunk['lat'], chunk['lon'])
+        else:
+            self.columns = {label: np.concatenate((column, chunk[label])) for label, column in self.columns.items()}
+        time = self.columns['simt']
+        keep = (time >= time.max() - self.window) | (time > self.resolved)
+        if not keep.all():
+            self.columns = {label: column[keep] for label, column in self.columns.items()}
+
+    def states(self):
+        ''' Latest logged state of every aircraft in the window, as a dictionary of columns. '''
+        if self.columns is None:
+            return {}
+        ids = self.columns['id']
+        order = np.lexsort((self.columns['simt'], ids))
+        last = np.append(ids[order][1:] != ids[order][:-1], True)
+        return {label: column[order[last]] for label, column in self.columns.items()}
+
+    def update(self, chunk):
+        ''' Adds a chunk of rows and resolves the timesteps it completes. Returns the new conflict events as a
+        dictionary of arrays (see Replay.replay), or {} if there are none. '''
+        self.append(chunk)
+        time = self.columns['simt']
+        order, starts, stops = timesteps(time)
+        step_times = time[order[starts]]
+
+        # Completed timesteps not resolved yet, the newest max_steps of them
+        pending = np.flatnonzero((step_times > self.resolved) & (step_times < step_times[-1]))
+        if not pending.size:
+            return {}
+        self.skipped += max(pending.size - self.max_steps, 0)
+        pending = pending[-self.max_steps:]
+        self.resolved = step_times[pending[-1]]
+
+        rows = np.concatenate([order[starts[i]:stops[i]] for i in pending])
+        step = np.repeat(np.arange(pending.size), stops[pending] - starts[pending])
+        columns = {label: column[rows] for label, column in self.columns.items()}
+        positions, headings, airspeeds = project_columns(columns, self.lat0, self.lon0)
+        return resolve_steps(columns['simt'], columns['id'], positions, headings, airspeeds, step,
+                             self.look_ahead, self.d_req)
+
+
+def follow(filename, poll_interval=0.5, timeout=None, **kwargs):
+    ''' Tails a log and yields the conflict events of every tick that has any. Keyword arguments go to
+    ConflictFeed. '''
+    feed = ConflictFeed(**kwargs)
+    for chunk in follow_log(filename, poll_interval, timeout):
+        events = feed.update(chunk)
+        if events:
+            yield events
+
+
+if __name__ == '__main__':
+    for events in follow(sys.argv[1]):
+        for row in zip(events['time'], events['id_a'], events['id_b'], events['t_los'], events['maneuver']):
+            print('t = %.1f s: %s / %s, LOS in %.1f s, %s' % row)
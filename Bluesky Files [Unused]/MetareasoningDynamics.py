@@ -0,0 +1,146 @@
+''' NumPy port of the point-mass aircraft model of metareasoning.slx, for closed-loop simulation of fleets.
+
+The parameters are those of Simulink Model/Metareasoningpreloadfcn.m and the initial conditions follow
+MetareasoningInitFcn.m. The plant is the 'Fixed-Wing UAV [All]' subsystem: first-order lags from the thrust, bank
+angle and load factor commands to their states, and the 6th order point mass in coordinated flight (Aerospace
+Blockset) driven by lift n W, drag from the Cd0/k polar and thrust at zero angle of attack. The 'DynInversionControl'
+subsystem turns desired airspeed, flight path angle and heading into those commands, with the v/gamma/chi
+bandwidths, the thrust limits and the stall limits on the load factor.
+
+The state of every aircraft is a row of state_names, so a fleet is an (N, 9) array (or (..., N, 9) for a batch
+of scenarios) and is integrated with fixed-step RK4. Commands are recomputed on every stage, as Simulink does
+for the algebraic controller. As in the model, chi is measured from the x axis towards the y axis and is not
+wrapped, and the thrust force is the thrust command itself (the lagged thrust state is only reported).
+'''
+
+import numpy as np
+
+
+# Parameters of Metareasoningpreloadfcn.m
+g = 9.81 # gravity [m/s^2]
+tau_t = 1 # thrust time constant [s]
+tau_b = .5 # bank angle time constant [s]
+tau_n = .5 # load factor time constant [s]
+rho = 1.225 # air density [kg/m^3]
+S = 37.161 # wing area
+Cd0 = .02 # parasite drag coefficient
+k = .1 # induced drag coefficient
+W = 14515 # weight, used as N (mass W/g)
+omega_v = .3 # velocity bandwidth [1/s]
+omega_gamma = .2 # gamma bandwidth [1/s]
+omega_chi = .2 # chi bandwidth [1/s]
+Tmax = 25600*4.44822 # maximum thrust [N]
+Clmax = 2.0 # maximum lift coefficient
+Clmin = -.5 # minimum lift coefficient
+nmax = 7 # maximum load factor (not used by the model)
+look_ahead = 120 # collision look-ahead [s]
+LOS_m = 9260 # loss of separation distance [m]
+
+state_names = ('x', 'y', 'h', 'Velocity', 'gamma', 'chi', 'thrust', 'mu', 'loadfactor')
+command_names = ('Thrust_command', 'mu_command', 'loadfactor_command')
+
+
+def drag(velocity, loadfactor):
+    ''' Drag [N] at airspeed velocity and load factor, from the lift coefficient of lift n W. '''
+    dynamic_pressure = 0.5*rho*velocity**2*S
+    Cl = loadfactor*W/dynamic_pressure
+    return dynamic_pressure*(Cd0 + k*Cl**2)
+
+
+def initial_state(positions, velocities, headings, flight_path_angles=0):
+    ''' Fleet state as in MetareasoningInitFcn.m: positions (N, 2) or (N, 3) [m], airspeeds [m/s], headings chi
+    and flight path angles [rad], trimmed to straight and level flight (thrust equal to drag, no bank, n = 1). '''
+    positions = np.asarray(positions, dtype=float)
+    velocities = np.asarray(velocities, dtype=float)
+    states = np.zeros(velocities.shape + (len(state_names),))
+    states[..., :positions.shape[-1]] = positions
+    states[..., 3] = velocities
+    states[..., 4] = flight_path_angles
+    states[..., 5] = headings
+    states[..., 6] = drag(velocities, 1)
+    states[..., 8] = 1
+    return states
+
+
+def dynamic_inversion(states, desired):
+    ''' Commands (..., 3) of command_names that drive states towards desired (..., 3) airspeed, flight path angle
+    and heading, as DynInversionControl. '''
+    _, _, _, velocity, gamma, chi, _, _, loadfactor = np.moveaxis(states, -1, 0)
+    velocity_desired, gamma_desired, chi_desired = np.moveaxis(desired, -1, 0)
+
+    thrust = W*np.sin(gamma) + drag(velocity, loadfactor) + omega_v*W/g*(velocity_desired - velocity)
+    a = np.cos(gamma) + velocity*omega_gamma/g*(gamma_desired - gamma)
+    b = velocity*np.cos(gamma)*omega_chi/g*(chi_desired - chi)
+    stall = 0.5*rho*S/W*velocity**2
+    return np.stack((np.clip(thrust, 0, Tmax),
+                     np.clip(np.arctan2(b, a), -np.pi/2, np.pi/2),
+                     np.maximum(np.minimum(np.hypot(a, b), Clmax*stall), Clmin*stall)), axis=-1)
+
+
+def state_rates(states, commands):
+    ''' Time derivative of states under commands (..., 3). '''
+    _, _, _, velocity, gamma, chi, thrust, mu, loadfactor = np.moveaxis(states, -1, 0)
+    thrust_command, mu_command, loadfactor_command = np.moveaxis(commands, -1, 0)
+    mass = W/g
+    lift = loadfactor*W
+
+    # 6th order point mass, coordinated flight, alpha = 0
+    velocity_dot = (thrust_command - drag(velocity, loadfactor))/mass - g*np.sin(gamma)
+    gamma_dot = (lift*np.cos(mu) - W*np.cos(gamma))/(mass*velocity)
+    chi_dot = lift*np.sin(mu)/(mass*velocity*np.cos(gamma))
+    ground_speed = velocity*np.cos(gamma)
+    return np.stack((ground_speed*np.cos(chi), ground_speed*np.sin(chi), velocity*np.sin(gamma),
+                     velocity_dot, gamma_dot, chi_dot,
+                     (thrust_command - thrust)/tau_t, (mu_command - mu)/tau_b, (loadfactor_command - loadfactor)/tau_n),
+                    axis=-1)
+
+
+def hold(t, states):
+    ''' Guidance of the BYPASS subsystem: the desired airspeed, flight path angle and heading are the current ones. '''
+    return states[..., 3:6]
+
+
+def rk4_step(t, states, dt, guidance=hold):
+    ''' Advances states by dt with the classic fourth-order Runge-Kutta scheme. guidance(t, states) returns the
+    desired airspeed, flight path angle and heading (..., 3) of every aircraft. '''
+    def rates(t, states):
+        return state_rates(states, dynamic_inversion(states, guidance(t, states)))
+
+    k1 = rates(t, states)
+    k2 = rates(t + dt/2, states + dt/2*k1)
+    k3 = rates(t + dt/2, states + dt/2*k2)
+    k4 = rates(t + dt, states + dt*k3)
+    return states + dt/6*(k1 + 2*k2 + 2*k3 + k4)
+
+
+def simulate(states, guidance=hold, stop_time=1000, dt=0.5, record=True):
+    ''' Closed-loop simulation from states over [0, stop_time] with a fixed step dt (the model's solver settings).
+    Returns the times and the states at every step (steps + 1, ..., 9), or only the final states if not record. '''
+    steps = int(round(stop_time/dt))
+    times = np.arange(steps + 1)*dt
+    states = np.asarray(states, dtype=float)
+    trajectory = np.empty((steps + 1,) + states.shape) if record else None
+    if record:
+        trajectory[0] = states
+    for i in range(steps):
+        states = rk4_step(times[i], states, dt, guidance)
+        if record:
+            trajectory[i + 1] = states
+    return (times, trajectory) if record else states
+
+
+def fleet_state(states):
+    ''' Positions (east, north) [m], headings from north [rad] and airspeeds [m/s] of the ConflictDetection
+    convention, reading x as north, y as east and chi as the heading (as trajectory_plot.m labels the axes). '''
+    positions = states[..., [1, 0]]
+    return positions, np.mod(states[..., 5], 2*np.pi), states[..., 3]*np.cos(states[..., 4])
+
+
+if __name__ == '__main__':
+    # Initial conditions of MetareasoningInitFcn.m, flown with BYPASS guidance
+    states = initial_state([[0, 0, 0], [22224, 23150, 0]], [205.7783, 246.9339], np.deg2rad([0, 270]))
+    times, trajectory = simulate(states)
+    separation = np.linalg.norm(trajectory[:, 0, :2] - trajectory[:, 1, :2], axis=-1)
+    print('Minimum separation {:.0f} m at {:.1f} s'.format(separation.min(), times[np.argmin(separation)]))
+    for name, value in zip(state_names, trajectory[-1].T):
+        print(name, value)
@@ -0,0 +1,158 @@
+''' Resolution of a conflict pair among N aircraft, rejecting maneuvers that cause secondary conflicts.
+
+The Erzberger & Heere (2010) resolution of a pair A/B only considers A and B. Here every candidate maneuver of the
+pair (maneuver x turn angle of the sweep) is also checked against the other aircraft near A and B, assumed to keep
+their heading. The turn of each maneuvering aircraft is approximated by chords, followed by the straight leg up to
+the look-ahead horizon, and the minimum distance of every chord and leg to every intruder is found in closed form,
+in a single broadcasted (candidate x intruder x segment) pass. Candidates that bring A or B within d_req of an
+intruder they would otherwise stay clear of are rejected; a maneuver whose resolution angle is rejected moves to
+its next larger angle that still resolves A/B, or is rejected as a whole.
+
+Positions are in meters (x east, y north), headings in radians from north and airspeeds in m/s.
+'''
+
+import numpy as np
+
+from Erz2010new import (maneuvers, maneuver_turn_angles, separation_kernel, separation_in_turn, resolution_data,
+                        resolution_order, resolution_types)
+from BatchResolution import turn_angle_grid, maneuver_labels
+from ConflictDetection import look_ahead, d_req, velocities, pair_encounters
+
+
+def trajectory_knots(position, heading, airspeed, turn_angle, turn_time, look_ahead=look_ahead, segments=8):
+    ''' Knots of the piecewise-linear path of an aircraft that turns by turn_angle (signed, rad) in turn_time
+    seconds, then flies straight until look_ahead. A turn longer than the horizon is cut at look_ahead, and the
+    flown part is split into `segments` chords. Arguments broadcast; returns knot times (..., segments + 2), knot
+    positions (..., segments + 2, 2) and the largest distance of the chords from the arc (m). '''
+    turn_angle = np.asarray(turn_angle, dtype=float)
+    turn_time = np.asarray(turn_time, dtype=float)
+
+    # Turn (8) at the rate of the full turn, flown for t <= turn_time within the horizon, then straight
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(turn_angle != 0, turn_angle/np.where(turn_time > 0, turn_time, np.inf), 0)[..., None]
+        radius = np.where(rate != 0, airspeed/np.where(rate != 0, rate, 1), 0) # signed, V/omega
+    turn_time = np.minimum(turn_time, look_ahead)
+    times = np.append(turn_time[..., None]*np.linspace(0, 1, segments + 1),
+                      np.full(turn_time.shape + (1,), look_ahead), axis=-1)
+    in_turn = np.minimum(times, turn_time[..., None])
+    heading_turn = heading + rate*in_turn
+    heading_end = (heading + rate*turn_time[..., None])
+    straight = times - in_turn
+    turning = rate != 0
+    x = np.where(turning, radius*(np.cos(heading) - np.cos(heading_turn)), airspeed*np.sin(heading)*in_turn)
+    y = np.where(turning, radius*(np.sin(heading_turn) - np.sin(heading)), airspeed*np.cos(heading)*in_turn)
+    x = position[..., 0, None] + x + airspeed*np.sin(heading_end)*straight
+    y = position[..., 1, None] + y + airspeed*np.cos(heading_end)*straight
+
+    sagitta = np.abs(radius[..., 0])*(1 - np.cos(np.abs(rate[..., 0])*turn_time/segments/2))
+    return times, np.stack((x, y), axis=-1), sagitta
+
+
+def path_separation(times, points, positions, velocities):
+    ''' Minimum distance over the horizon between piecewise-linear paths (knot times (..., M) and points
+    (..., M, 2)) and aircraft on straight tracks (positions and velocities (I, 2)). Returns (..., I). '''
+    # Relative position of the path to every intruder at the knots, per component: (..., I, M)
+    times = times[..., None, :]
+    x = points[..., None, :, 0] - (positions[:, 0, None] + velocities[:, 0, None]*times)
+    y = points[..., None, :, 1] - (positions[:, 1, None] + velocities[:, 1, None]*times)
+    x0, y0 = x[..., :-1], y[..., :-1]
+    dx, dy = x[..., 1:] - x0, y[..., 1:] - y0
+
+    # Closest point of every segment, clamped to the segment
+    length2 = dx*dx + dy*dy
+    s = np.clip(-(x0*dx + y0*dy)/np.where(length2 > 0, length2, 1), 0, 1)
+    x0 += dx*s
+    y0 += dy*s
+    return np.sqrt(np.min(x0*x0 + y0*y0, axis=-1))
+
+
+def neighbors(positions, airspeeds, a, b, look_ahead=look_ahead, d_req=d_req):
+    ''' Indices of the aircraft other than a and b that can come within d_req of either during the horizon. '''
+    reach = d_req + look_ahead*(airspeeds + max(airspeeds[a], airspeeds[b]))
+    distance = np.minimum(np.linalg.norm(positions - positions[a], axis=1),
+                          np.linalg.norm(positions - positions[b], axis=1))
+    close = distance <= reach
+    close[[a, b]] = False
+    return np.flatnonzero(close)
+
+
+def resolve_multi(positions, headings, airspeeds, a, b, turn_angles=turn_angle_grid, look_ahead=look_ahead,
+                  d_req=d_req, segments=8):
+    ''' Resolves the conflict between aircraft a and b of a fleet snapshot, rejecting candidate maneuvers that cause
+    secondary conflicts with the other aircraft. Returns the chosen resolution as a dictionary (the keys of
+    resolve_batch, with resolution_type 'rejected' if every maneuver causes a secondary conflict), the number of
+    intruders checked and the labels of the rejected maneuvers. '''
+    positions = np.asarray(positions, dtype=float)
+    headings = np.asarray(headings, dtype=float)
+    airspeeds = np.asarray(airspeeds, dtype=float)
+    encounter = pair_encounters(positions, headings, airspeeds, np.array([[a, b]]))
+
+    # Erzberger sweep of all maneuvers for the pair, as in ManeuverData.resolve_all
+    bank_angles = np.deg2rad([[bank_a, bank_b] for _, bank_a, bank_b in maneuvers])
+    bank_a, bank_b = bank_angles[:, :1], bank_angles[:, 1:]
+    airspeed_a, airspeed_b = airspeeds[a], airspeeds[b]
+    sweep, turn_times, turn_angles_a, turn_angles_b = maneuver_turn_angles(turn_angles, airspeed_a, airspeed_b,
+                                                                          bank_a, bank_b)
+    x_b, y_b, heading_b = encounter['x_b'][0], encounter['y_b'][0], encounter['heading_b'][0]
+    separation, t_smin, d_smin = separation_kernel(x_b, y_b, heading_b, airspeed_a, airspeed_b,
+                                                   bank_a, bank_b, turn_angles_a, turn_angles_b)
+    data = resolution_data(separation, t_smin, d_smin, sweep, turn_times, d_req,
+                           separation_in_turn(x_b, y_b, heading_b, airspeed_a, airspeed_b, bank_a, bank_b))
+    j = np.arange(sweep.shape[-1])
+    index = np.argmin(separation, axis=-1)
+    separation_straight = np.where(j > index[:, None], separation, d_smin)
+    resolution_times = turn_times + np.where(t_smin >= 0, t_smin, 0)
+    chosen = np.argmin(np.abs(sweep - data['resolution_angle'][:, None]), axis=-1)
+
+    # Candidates that can be chosen: the resolution angle, and the larger angles that still resolve a type 1
+    candidates = (j == chosen[:, None]) | ((j > chosen[:, None]) & (separation_straight > d_req)
+                                           & (data['resolution_type'][:, None] == 0))
+
+    # Secondary conflicts of the candidates with every intruder, for A's and B's paths. An aircraft flying
+    # straight keeps its current path, so only turning ones can cause new conflicts.
+    intruders = neighbors(positions, airspeeds, a, b, look_ahead, d_req)
+    safe = np.ones(sweep.shape, dtype=bool)
+    if intruders.size > 0:
+        intruder_positions = positions[intruders]
+        intruder_velocities = velocities(headings[intruders], airspeeds[intruders])
+        for k, turn_angle in ((a, turn_angles_a), (b, turn_angles_b)):
+            turning = candidates & (turn_angle != 0)
+            if not turning.any():
+                continue
+            null_times, null_points, _ = trajectory_knots(positions[k], headings[k], airspeeds[k], 0., 0.,
+                                                          look_ahead, 1)
+            clear = path_separation(null_times, null_points, intruder_positions, intruder_velocities) >= d_req
+            times, points, sagitta = trajectory_knots(positions[k], headings[k], airspeeds[k], turn_angle[turning],
+                                                      turn_times[turning], look_ahead, segments)
+            distance = path_separation(times, points, intruder_positions[clear], intruder_velocities[clear])
+            safe[turning] &= np.all(distance - sagitta[:, None] >= d_req, axis=-1)
+
+    # Keep safe resolutions, move type 1 resolutions to their next safe angle, reject the rest
+    resolution_type = data['resolution_type'].copy()
+    angle_index = chosen.copy()
+    resolution_time = data['resolution_time'].copy()
+    min_separation = data['min_separation'].copy()
+    rejected = []
+    for m in range(len(maneuvers)):
+        if safe[m, chosen[m]]:
+            continue
+        alternatives = np.flatnonzero((j > chosen[m]) & safe[m] & (separation_straight[m] > d_req))
+        if resolution_type[m] == 0 and alternatives.size > 0:
+            angle_index[m] = alternatives[0]
+            resolution_time[m] = resolution_times[m, alternatives[0]]
+            min_separation[m] = separation_straight[m, alternatives[0]]
+        else:
+            resolution_type[m] = len(resolution_types)
+            rejected.append(str(maneuver_labels[m]))
+
+    # Rank as resolve_all, with rejected maneuvers last
+    best = resolution_order(resolution_type, np.where(resolution_type < len(resolution_types), min_separation,
+                                                      -np.inf))[0]
+    labels = np.append(resolution_types, 'rejected')
+    return {'maneuver': maneuver_labels[best],
+            'resolution_type': labels[resolution_type[best]],
+            'resolution_angle': sweep[best, angle_index[best]],
+            'resolution_time': resolution_time[best],
+            'min_separation': min_separation[best],
+            'intruders': intruders.size,
+            'rejected': rejected}
@@ -0,0 +1,83 @@
+''' Projection of BlueSky log data into the local metric frames used by ManeuverData.
+
+Log columns carry latitude/longitude in degrees, headings in degrees from north and true airspeed in m/s.
+ManeuverData works in meters (x east, y north) with A at the origin heading north. All functions work on
+whole arrays (e.g. the columns of a log or a fleet snapshot) at once.
+'''
+
+import numpy as np
+
+
+# WGS84 ellipsoid
+a = 6378137.0 # semi-major axis [m]
+f = 1/298.257223563 # flattening
+e2 = f*(2 - f) # first eccentricity squared
+
+
+def reference(lat, lon):
+    ''' Reference point for a local frame: the mean latitude and longitude of the data in degrees. '''
+    return float(np.mean(lat)), float(np.mean(lon))
+
+
+def flat_earth(lat, lon, lat0, lon0, alt0=0):
+    ''' Flat-earth projection of latitude/longitude (deg) to east/north meters around (lat0, lon0), using the
+    radii of curvature of the ellipsoid at the reference. The error grows with distance from the reference
+    (a few hundred meters at half a degree), so use enu for frames spanning large areas. '''
+    phi0 = np.deg2rad(lat0)
+    w = np.sqrt(1 - e2*np.sin(phi0)**2)
+    N = a/w # prime vertical radius
+    M = a*(1 - e2)/w**3 # meridian radius
+    dlon = (np.asarray(lon, dtype=float) - lon0 + 180) % 360 - 180
+    x = (N + alt0)*np.cos(phi0)*np.deg2rad(dlon)
+    y = (M + alt0)*np.deg2rad(np.asarray(lat, dtype=float) - lat0)
+    return x, y
+
+
+def ecef(lat, lon, alt):
+    ''' Earth-centered, earth-fixed coordinates of latitude/longitude (deg) and altitude (m). '''
+    phi = np.deg2rad(lat)
+    lam = np.deg2rad(lon)
+    N = a/np.sqrt(1 - e2*np.sin(phi)**2)
+    return ((N + alt)*np.cos(phi)*np.cos(lam),
+            (N + alt)*np.cos(phi)*np.sin(lam),
+            (N*(1 - e2) + alt)*np.sin(phi))
+
+
+def enu(lat, lon, alt, lat0, lon0, alt0=0):
+    ''' Exact east/north/up meters of latitude/longitude (deg) and altitude (m) relative to a reference point. '''
+    X, Y, Z = ecef(lat, lon, alt)
+    X0, Y0, Z0 = ecef(lat0, lon0, alt0)
+    dX, dY, dZ = X - X0, Y - Y0, Z - Z0
+    phi0 = np.deg2rad(lat0)
+    lam0 = np.deg2rad(lon0)
+    east = -np.sin(lam0)*dX + np.cos(lam0)*dY
+    north = -np.sin(phi0)*np.cos(lam0)*dX - np.sin(phi0)*np.sin(lam0)*dY + np.cos(phi0)*dZ
+    up = np.cos(phi0)*np.cos(lam0)*dX + np.cos(phi0)*np.sin(lam0)*dY + np.sin(phi0)*dZ
+    return east, north, up
+
+
+def project_columns(columns, lat0=None, lon0=None, method='flat'):
+    ''' Local frame states from log columns ('lat', 'lon', 'hdg', 'tas' and, for method='enu', 'alt').
+    The reference defaults to the mean position. Returns positions (..., 2) in meters, headings in radians
+    from north and airspeeds in m/s, as ConflictDetection expects. '''
+    if lat0 is None or lon0 is None:
+        lat0, lon0 = reference(columns['lat'], columns['lon'])
+    if method == 'enu':
+        x, y, _ = enu(columns['lat'], columns['lon'], columns['alt'], lat0, lon0)
+    else:
+        x, y = flat_earth(columns['lat'], columns['lon'], lat0, lon0)
+    return np.stack((x, y), axis=-1), np.deg2rad(columns['hdg']), np.asarray(columns['tas'], dtype=float)
+
+
+def relative_frames(positions, headings, pairs):
+    ''' Position and heading of B in the frame of A for index pairs (A, B): A at the origin heading north, as
+    ManeuverData expects. Returns x_b, y_b (m) and heading_b (rad in [0, 2 pi)). '''
+    positions = np.asarray(positions, dtype=float)
+    headings = np.asarray(headings, dtype=float)
+    a, b = pairs[:, 0], pairs[:, 1]
+
+    # Rotate the relative position by A's heading
+    dx, dy = (positions[b] - positions[a]).T
+    cos_a = np.cos(headings[a])
+    sin_a = np.sin(headings[a])
+    return dx*cos_a - dy*sin_a, dx*sin_a + dy*cos_a, np.mod(headings[b] - headings[a], 2*np.pi)
@@ -0,0 +1,87 @@
+''' Offline replay of a recorded BlueSky log through conflict detection and resolution.
+
+Every logged timestep is screened for predicted losses of separation (ConflictDetection) and each conflict is
+resolved with the Erzberger maneuvers (BatchResolution). Blocks of consecutive timesteps are processed together
+in single vectorized passes. The result is a compact event table with one row per conflict per timestep.
+'''
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Bluesky Test Logs'))
+
+from DataHandler import load_log
+from BatchResolution import resolve_batch
+from ConflictDetection import look_ahead, d_req, broad_phase, cpa_screen, pair_encounters
+from Projection import project_columns
+
+
+def timesteps(time):
+    ''' Row order sorted by time and the [start, stop) range of every timestep in it. '''
+    order = np.argsort(time, kind='stable')
+    _, starts = np.unique(time[order], return_index=True)
+    return order, starts, np.append(starts[1:], len(order))
+
+
+def resolve_steps(time, ids, positions, headings, airspeeds, step, look_ahead=look_ahead, d_req=d_req):
+    ''' Detects and resolves the conflicts in a set of state rows, pairing only rows of the same step (e.g. the
+    timestep of each row). All steps are screened and resolved in single vectorized passes. Returns the event
+    rows as a dictionary of arrays, or {} if there is no conflict. '''
+    pairs = broad_phase(positions, headings, airspeeds, look_ahead, d_req, groups=step)
+    screen = cpa_screen(positions, headings, airspeeds, pairs, look_ahead, d_req)
+    conflict = screen['conflict']
+    if not conflict.any():
+        return {}
+    pairs = pairs[conflict]
+
+    encounters = pair_encounters(positions, headings, airspeeds, pairs)
+    resolution = resolve_batch(encounters, d_req=d_req)
+    a, b = pairs[:, 0], pairs[:, 1]
+    return {'time': time[a],
+            'id_a': ids[a],
+            'id_b': ids[b],
+            't_los': screen['t_los'][conflict],
+            't_cpa': screen['t_cpa'][conflict],
+            'd_cpa': screen['d_cpa'][conflict],
+            **resolution}
+
+
+def replay(filename, block_size=100, every=1, look_ahead=look_ahead, d_req=d_req):
+    ''' Detects and resolves the conflicts in a log at every `every`-th logged timestep, block_size timesteps at
+    a time. Positions are projected around the mean position of the log. Returns the event table as a
+    dictionary of arrays: time, the ids of aircraft A and B, time to loss of separation, time and distance of
+    closest approach, and the resolution picked by resolve_batch for A. '''
+    _, _, columns, _ = load_log(filename)
+    time = np.asarray(columns['simt'])
+    ids = np.asarray(columns['id'])
+    positions, headings, airspeeds = project_columns(columns)
+    order, starts, stops = timesteps(time)
+
+    blocks = []
+    for first in range(0, len(starts), block_size*every):
+        last = min(first + block_size*every, len(starts)) - 1
+
+        # All rows of the block's timesteps, with the timestep of each row as its group
+        rows = order[starts[first]:stops[last]]
+        step = np.searchsorted(starts, np.arange(starts[first], stops[last]), side='right') - 1
+        rows, step = rows[step % every == 0], step[step % every == 0]
+
+        block = resolve_steps(time[rows], ids[rows], positions[rows], headings[rows], airspeeds[rows], step,
+                              look_ahead, d_req)
+        if block:
+            blocks.append(block)
+
+    if not blocks:
+        return {}
+    events = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+
+    # Order events by time, then pair
+    order = np.lexsort((events['id_b'], events['id_a'], events['time']))
+    return {key: column[order] for key, column in events.items()}
+
+
+if __name__ == '__main__':
+    events = replay(sys.argv[1])
+    print(f'{len(events.get("time", []))} conflict events')
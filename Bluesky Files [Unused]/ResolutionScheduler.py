@@ -0,0 +1,130 @@
+''' Time-to-LOS priority scheduling of conflict resolution work.
+
+Conflicts detected within the look-ahead horizon are queued with a deadline: the simulation time at which
+separation would be lost (less a margin for the crew to react). Each scheduler step spends a wall-clock budget on
+the queue in earliest-deadline-first order, resolving conflicts in vectorized batches for BatchResolution. While
+urgent conflicts (deadline within `urgent` seconds) are queued the batches are kept small, so the most urgent ones
+are answered first; the remaining conflicts are batched together in large batches. Conflicts whose deadline
+passes before they are served are dropped and counted as deadline misses.
+'''
+
+import heapq
+import time
+
+import numpy as np
+
+from BatchResolution import d_req, resolve_batch
+from ConflictDetection import look_ahead
+
+
+advisory_keys = ('maneuver', 'resolution_type', 'resolution_angle', 'resolution_time', 'min_separation')
+
+
+class ResolutionScheduler:
+    ''' Earliest-deadline-first queue of resolution jobs keyed by aircraft pair. '''
+
+    def __init__(self, look_ahead=look_ahead, urgent=30, margin=0, batch_size=256, urgent_batch_size=16,
+                 d_req=d_req):
+        self.look_ahead = look_ahead # horizon of admitted conflicts [s]
+        self.urgent = urgent # deadlines closer than this are served in small batches [s]
+        self.margin = margin # reaction time subtracted from the time to LOS [s]
+        self.batch_size = batch_size # conflicts per vectorized batch
+        self.urgent_batch_size = urgent_batch_size # conflicts per batch while urgent ones are queued
+        self.timing = np.zeros(5) # decaying sums of 1, n, t, n^2 and n t over batches of n conflicts taking t s
+        self.d_req = d_req
+        self.heap = [] # (deadline, serial, pair)
+        self.jobs = dict() # pair -> (serial, deadline, encounter)
+        self.serial = 0
+        self.advisories = dict() # pair -> newest advisory
+        self.served = 0
+        self.urgent_served = 0
+        self.batches = 0
+        self.misses = 0
+        self.max_depth = 0
+
+    def submit(self, pairs, encounters, t_los, now):
+        ''' Queues conflicts at simulation time now, given their pairs, encounters as a struct-of-arrays (see
+        BatchResolution.make_encounters) and times to loss of separation. A newer job for a pair replaces the
+        queued one; conflicts beyond the look-ahead horizon are not admitted. '''
+        for i, pair in enumerate(pairs):
+            if t_los[i] > self.look_ahead:
+                continue
+            self.serial += 1
+            deadline = now + max(t_los[i] - self.margin, 0)
+            self.jobs[pair] = (self.serial, deadline, {key: value[i] for key, value in encounters.items()})
+            heapq.heappush(self.heap, (deadline, self.serial, pair))
+        self.max_depth = max(self.max_depth, len(self.jobs))
+
+    def pop(self):
+        ''' Removes and returns the most urgent current job as (pair, deadline, encounter), skipping replaced
+        ones, or None if the queue is empty. '''
+        while self.heap:
+            deadline, serial, pair = heapq.heappop(self.heap)
+            job = self.jobs.get(pair)
+            if job is not None and job[0] == serial:
+                del self.jobs[pair]
+                return pair, deadline, job[2]
+        return None
+
+    def peek(self):
+        ''' Deadline of the most urgent current job, or None if the queue is empty. '''
+        while self.heap:
+            deadline, serial, pair = self.heap[0]
+            job = self.jobs.get(pair)
+            if job is not None and job[0] == serial:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def affordable(self, remaining):
+        ''' Number of conflicts a batch can hold to finish within remaining seconds, from a least-squares fit of
+        batch time = overhead + cost*conflicts over recent batches. '''
+        count, n, t, nn, nt = self.timing
+        if count < 2 or nn*count - n*n <= 1e-9*nn*count:
+            return self.batch_size if count == 0 else int(remaining*n/max(t, 1e-9))
+        cost = max((nt*count - n*t)/(nn*count - n*n), 1e-9)
+        overhead = max((t - cost*n)/count, 0)
+        return int((remaining - overhead)/cost)
+
+    def step(self, now, budget):
+        ''' Serves the queue at simulation time now for about budget seconds of wall time. Batches are sized
+        from the measured cost per conflict so that the last one ends within the budget; at least one job is
+        served per step. Returns the pairs whose advisory was updated; the advisories are in self.advisories. '''
+        start = time.perf_counter()
+        updated = []
+
+        # Jobs whose deadline has passed can no longer be served in time
+        while self.peek() is not None and self.peek() < now:
+            self.pop()
+            self.misses += 1
+
+        while self.peek() is not None:
+            remaining = budget - (time.perf_counter() - start)
+            if updated and remaining <= 0:
+                break
+            size = self.urgent_batch_size if self.peek() - now <= self.urgent else self.batch_size
+            size = max(1, min(size, self.affordable(remaining)))
+            jobs = [job for job in (self.pop() for _ in range(size)) if job is not None]
+            self.urgent_served += sum(int(deadline - now <= self.urgent) for _, deadline, _ in jobs)
+
+            batch_start = time.perf_counter()
+            encounters = {key: np.array([encounter[key] for _, _, encounter in jobs]) for key in jobs[0][2]}
+            resolution = resolve_batch(encounters, d_req=self.d_req)
+            n, t = len(jobs), time.perf_counter() - batch_start
+            self.timing = 0.9*self.timing + np.array([1, n, t, n*n, n*t])
+            for i, (pair, _, _) in enumerate(jobs):
+                self.advisories[pair] = {key: resolution[key][i] for key in advisory_keys}
+                updated.append(pair)
+            self.batches += 1
+        self.served += len(updated)
+        return updated
+
+    def metrics(self):
+        ''' Queue depth, its maximum so far, jobs served (of which urgent), batches and deadline misses. '''
+        return {'depth': len(self.jobs),
+                'max_depth': self.max_depth,
+                'served': self.served,
+                'urgent_served': self.urgent_served,
+                'batches': self.batches,
+                'misses': self.misses,
+                'miss_rate': self.misses/max(self.served + self.misses, 1)}
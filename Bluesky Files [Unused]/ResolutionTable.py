@@ -0,0 +1,202 @@
+''' Precomputed resolution lookup tables over normalized encounter geometry.
+
+For a given airspeed of A, the Erzberger & Heere (2010) resolution of an encounter only depends on the geometry of
+B relative to A: the bearing and range of B, the heading of B relative to A and the speed ratio V_B/V_A. A table
+is generated offline by sweeping BatchResolution over a regular grid of these four coordinates, and is stored as
+one .npy file per column that is memory-mapped at runtime, so only the cells that are queried are read.
+
+Queries locate the encounter in the grid with O(1) arithmetic and interpolate the resolution between the 16
+surrounding cells. Where those cells do not agree on the maneuver and resolution type (near type transitions) or
+their resolution angles spread more than max_angle_spread, or the encounter lies outside the table or belongs to
+another speed class, the resolution is evaluated exactly. The spread of the corner angles is returned with every
+query as an estimate of the interpolation error. ResolutionTable.agreement measures the actual error against the
+exact solver, and running this module checks it on a small table.
+'''
+
+import os
+import sys
+import tempfile
+from itertools import product
+
+import numpy as np
+
+from BatchResolution import d_req, turn_angle_grid, maneuver_labels, make_encounters, resolve_batch
+from Erz2010new import resolution_types
+
+
+# Default grid: bearing and relative heading are periodic, range and speed ratio are bounded
+bearings = np.deg2rad(np.arange(0, 360, 5))
+ranges = np.arange(2000, 40001, 1000) # m
+headings = np.deg2rad(np.arange(0, 360, 10))
+speed_ratios = np.linspace(0.6, 1.6, 11)
+
+axis_names = ('bearing', 'range', 'heading', 'speed_ratio')
+periodic = (True, False, True, False)
+table_columns = ('maneuver', 'resolution_type', 'resolution_angle', 'resolution_time', 'min_separation')
+table_dtypes = (np.int8, np.int8, np.float32, np.float32, np.float32)
+edge_tolerance = 1e-9 # grid steps by which a coordinate may lie outside a bounded axis and still be inside
+
+
+def geometry_encounters(airspeed_a, bearing, range_, heading, speed_ratio):
+    ''' Encounters for BatchResolution from normalized geometry (bearing from A's heading and relative heading in
+    radians, range in meters). All arguments broadcast. '''
+    bearing, range_, heading, speed_ratio = np.broadcast_arrays(bearing, range_, heading, speed_ratio)
+    position_b = np.stack((range_*np.sin(bearing), range_*np.cos(bearing)), axis=-1).reshape(-1, 2)
+    return make_encounters(airspeed_a, airspeed_a*speed_ratio.ravel(), position_b, heading.ravel())
+
+
+def encounter_geometry(encounters):
+    ''' Normalized geometry (bearing, range, relative heading, speed ratio) of encounters. '''
+    return (np.mod(np.arctan2(encounters['x_b'], encounters['y_b']), 2*np.pi),
+            np.hypot(encounters['x_b'], encounters['y_b']),
+            np.mod(encounters['heading_b'], 2*np.pi),
+            encounters['airspeed_b']/encounters['airspeed_a'])
+
+
+def build_table(path, airspeed_a, axes=(bearings, ranges, headings, speed_ratios), d_req=d_req,
+                turn_angles=turn_angle_grid, chunk_size=20000):
+    ''' Sweeps all maneuvers over the geometry grid for one airspeed of A (m/s) and writes the table to the
+    directory path. Every axis must be evenly spaced; the periodic axes (bearing, heading) must cover a full
+    turn without repeating 2 pi. Cells are evaluated chunk_size at a time straight into the memory-mapped
+    columns, so the table never has to fit in memory. The axes file is written last, so an interrupted build is
+    never read. '''
+    axes = [np.asarray(axis, dtype=float) for axis in axes]
+    shape = tuple(axis.size for axis in axes)
+    os.makedirs(path, exist_ok=True)
+    columns = {name: np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+', dtype=dtype,
+                                               shape=shape)
+               for name, dtype in zip(table_columns, table_dtypes)}
+
+    size = int(np.prod(shape))
+    for start in range(0, size, chunk_size):
+        cells = np.unravel_index(np.arange(start, min(start + chunk_size, size)), shape)
+        encounters = geometry_encounters(airspeed_a, *(axis[cell] for axis, cell in zip(axes, cells)))
+        resolution = resolve_batch(encounters, turn_angles, d_req, labels=False)
+        for name, column in columns.items():
+            column[cells] = resolution[name]
+
+    for column in columns.values():
+        column.flush()
+    np.savez(os.path.join(path, 'axes.npz'), airspeed_a=airspeed_a, d_req=d_req, turn_angles=turn_angles,
+             **dict(zip(axis_names, axes)))
+
+
+class ResolutionTable:
+    ''' Memory-mapped resolution table with interpolated queries. '''
+
+    def __init__(self, path, speed_tolerance=1e-3, max_angle_spread=np.deg2rad(10)):
+        with np.load(os.path.join(path, 'axes.npz')) as meta:
+            meta = dict(meta)
+        self.airspeed_a = float(meta['airspeed_a'])
+        self.d_req = float(meta['d_req'])
+        self.turn_angles = meta['turn_angles']
+        self.axes = [meta[name] for name in axis_names]
+        self.speed_tolerance = speed_tolerance # relative airspeed difference of A still served by the table
+        self.max_angle_spread = max_angle_spread # largest spread of the corner resolution angles interpolated [rad]
+        self.columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in table_columns}
+        self.exact = 0 # queries evaluated exactly
+        self.interpolated = 0 # queries served by the table
+
+    def locate(self, coordinates):
+        ''' Lower cell index, upper cell index and fractional position along every axis, and a flag for the
+        encounters inside the table. Bounded axes are closed: a coordinate on either edge, up to edge_tolerance
+        grid steps beyond it, is inside and falls on the edge cell. '''
+        inside = True
+        cells = []
+        for axis, wrap, value in zip(self.axes, periodic, coordinates):
+            step = 2*np.pi/axis.size if wrap else axis[1] - axis[0]
+            position = (value - axis[0])/step
+            if not wrap:
+                inside = inside & (position >= -edge_tolerance) & (position <= axis.size - 1 + edge_tolerance)
+                position = np.clip(position, 0, axis.size - 1)
+            lower = np.floor(position)
+            fraction = position - lower
+            if wrap:
+                lower = np.mod(lower, axis.size).astype(int)
+                upper = np.mod(lower + 1, axis.size)
+            else:
+                lower = lower.astype(int)
+                upper = np.minimum(lower + 1, axis.size - 1)
+            cells.append((lower, upper, fraction))
+        return cells, inside
+
+    def query(self, encounters):
+        ''' Resolutions for a batch of encounters, as resolve_batch returns them, with a flag for the encounters
+        that were evaluated exactly instead of interpolated and the spread of the corner resolution angles (rad,
+        0 for exact encounters), which bounds the interpolated angle where the resolution varies monotonically
+        across the cell. '''
+        n = len(encounters['x_b'])
+        cells, inside = self.locate(encounter_geometry(encounters))
+        speed_class = np.abs(encounters['airspeed_a']/self.airspeed_a - 1) <= self.speed_tolerance
+        served = np.flatnonzero(inside & speed_class)
+
+        # Values and interpolation weights of the 16 corners of every served encounter's cell
+        upper = np.array(list(product((False, True), repeat=len(cells))))[:, :, None]
+        index = tuple(np.where(upper[:, k], high[served], low[served]) for k, (low, high, _) in enumerate(cells))
+        weights = np.prod([np.where(upper[:, k], fraction[served], 1 - fraction[served])
+                           for k, (_, _, fraction) in enumerate(cells)], axis=0)
+        values = {name: column[index] for name, column in self.columns.items()}
+
+        # Interpolate where all corners agree on maneuver and type and their angles are close, evaluate exactly
+        # elsewhere
+        spread = values['resolution_angle'].max(axis=0) - values['resolution_angle'].min(axis=0)
+        agree = ((values['maneuver'] == values['maneuver'][0]).all(axis=0)
+                 & (values['resolution_type'] == values['resolution_type'][0]).all(axis=0)
+                 & (spread <= self.max_angle_spread))
+        exact = np.ones(n, dtype=bool)
+        exact[served[agree]] = False
+
+        resolution = {'maneuver': np.empty(n, dtype=maneuver_labels.dtype),
+                      'resolution_type': np.empty(n, dtype=resolution_types.dtype)}
+        resolution.update((name, np.empty(n)) for name in table_columns[2:])
+        rows = served[agree]
+        resolution['maneuver'][rows] = maneuver_labels[values['maneuver'][0, agree]]
+        resolution['resolution_type'][rows] = resolution_types[values['resolution_type'][0, agree]]
+        for name in table_columns[2:]:
+            resolution[name][rows] = np.sum(weights[:, agree]*values[name][:, agree], axis=0)
+
+        if exact.any():
+            subset = {key: value[exact] for key, value in encounters.items()}
+            for name, value in resolve_batch(subset, self.turn_angles, self.d_req).items():
+                resolution[name][exact] = value
+        self.exact += int(exact.sum())
+        self.interpolated += int(n - exact.sum())
+        resolution['exact'] = exact
+        resolution['angle_spread'] = np.zeros(n)
+        resolution['angle_spread'][rows] = spread[agree]
+        return resolution
+
+    def agreement(self, encounters):
+        ''' Compares the interpolated resolutions of encounters with resolve_batch. Returns the fraction of
+        encounters interpolated, the fractions of those with the exact maneuver and resolution type, and the
+        median, 95th and 99th percentile and maximum of their angle error in degrees. '''
+        resolution = self.query(encounters)
+        rows = ~resolution['exact']
+        if not rows.any():
+            return {'interpolated': 0.0}
+        subset = {key: value[rows] for key, value in encounters.items()}
+        exact = resolve_batch(subset, self.turn_angles, self.d_req)
+        error = np.rad2deg(np.abs(resolution['resolution_angle'][rows] - exact['resolution_angle']))
+        return {'interpolated': float(rows.mean()),
+                'maneuver': float(np.mean(resolution['maneuver'][rows] == exact['maneuver'])),
+                'resolution_type': float(np.mean(resolution['resolution_type'][rows] == exact['resolution_type'])),
+                'angle_error': dict(zip(('median', 'p95', 'p99', 'max'),
+                                        np.append(np.percentile(error, [50, 95, 99]), error.max()).tolist()))}
+
+
+if __name__ == '__main__':
+    # Agreement of a small table with the exact solver on random encounters of its speed class
+    airspeed_a = 220.
+    axes = (np.deg2rad(np.arange(0, 360, 10)), np.arange(4000, 30001, 2000), np.deg2rad(np.arange(0, 360, 15)),
+            np.linspace(0.8, 1.2, 5))
+    path = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp()
+    build_table(path, airspeed_a, axes)
+    table = ResolutionTable(path)
+    rng = np.random.default_rng(0)
+    n = 20000
+    encounters = make_encounters(airspeed_a, airspeed_a*rng.uniform(0.8, 1.2, n), rng.uniform(-25000, 25000, (n, 2)),
+                                 rng.uniform(0, 2*np.pi, n))
+    result = table.agreement(encounters)
+    print(result)
+    assert result['maneuver'] >= 0.99 and result['resolution_type'] >= 0.99
+    assert result['angle_error']['p95'] <= 1 and result['angle_error']['p99'] <= 3
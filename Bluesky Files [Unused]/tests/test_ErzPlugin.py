@@ -0,0 +1,63 @@
+''' Headless test of the ERZ2010 BlueSky plugin: the bluesky module is replaced by a fake with a traffic object and
+a stack that records the commands, so update() runs without a simulator. '''
+
+import importlib
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeStack:
+    def __init__(self):
+        self.commands = []
+
+    def stack(self, command):
+        self.commands.append(command)
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    # Two aircraft 10 km apart flying head-on at 230 m/s, in conflict within the look-ahead
+    traf = types.SimpleNamespace(id=['KL204', 'BA117'], ntraf=2, lat=np.array([52.0, 52.0]),
+                                 lon=np.array([4.0, 4.147]), hdg=np.array([90.0, 270.0]),
+                                 tas=np.array([230.0, 230.0]))
+    bluesky = types.ModuleType('bluesky')
+    bluesky.stack = FakeStack()
+    bluesky.traf = traf
+    monkeypatch.setitem(sys.modules, 'bluesky', bluesky)
+    monkeypatch.delitem(sys.modules, 'ErzPlugin', raising=False)
+    module = importlib.import_module('ErzPlugin')
+    yield module
+    module.enable(False)
+
+
+def test_update_echoes_advisory(plugin):
+    config, _ = plugin.init_plugin()
+    assert config['update'] is plugin.update
+    plugin.enable(True)
+
+    deadline = time.monotonic() + 60
+    commands = plugin.stack.commands
+    while not commands and time.monotonic() < deadline:
+        plugin.update()
+        time.sleep(0.05)
+
+    assert len(commands) == 1
+    assert commands[0].startswith('ECHO ERZ2010 KL204 / BA117: ')
+    advisory = plugin.resolver.advisories[('KL204', 'BA117')]
+    assert 'type {},'.format(advisory['resolution_type']) in commands[0]
+
+
+def test_update_without_resolver_or_traffic(plugin):
+    plugin.update()
+    plugin.enable(True)
+    plugin.traf.ntraf = 1
+    plugin.update()
+    assert plugin.stack.commands == []
+    assert plugin.resolver.serial == 0